@@ -0,0 +1,54 @@
+"""
+Benchmark of the script start-up time.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import [number of runs]
+
+It prints the best wall time of the module import and of the --version
+call in fresh interpreters, the printed version and the heavy modules
+loaded by the --version call.
+"""
+
+import subprocess
+import sys
+import time
+
+RUNS = 5
+HEAVY_MODULES = ('bugzilla', 'jira', 'numpy', 'pandas', 'pyperclip', 'requests')
+
+VERSION = 'import sys; sys.argv = ["synct", "--version"]; from synct.synct import main; main()'
+
+COMMANDS = {
+    'import synct.synct': [sys.executable, '-c', 'import synct.synct'],
+    'synct --version': [sys.executable, '-c', VERSION]
+}
+
+# The heavy modules are listed when the script exits after --version
+LOADED_MODULES = 'import atexit, sys; atexit.register(lambda: print(" ".join(sorted(m for m ' \
+        + 'in ' + repr(HEAVY_MODULES) + ' if m in sys.modules)), file=sys.stderr)); ' + VERSION
+
+def best_time(command, runs):
+    """ Get the best wall time of the command in seconds """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    """ Run the benchmark """
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else RUNS
+    loaded = subprocess.run([sys.executable, '-c', LOADED_MODULES], check=True, \
+            capture_output=True, text=True)
+    if not loaded.stdout.startswith('synct '):
+        sys.exit('synct --version did not print the version')
+    for name, command in COMMANDS.items():
+        print(f'{name:20} {best_time(command, runs) * 1000:8.0f} ms')
+    print(f'{"version":20} {loaded.stdout.strip()}')
+    print(f'{"heavy modules":20} {loaded.stderr.strip() or "none"}')
+
+if __name__ == '__main__':
+    main()
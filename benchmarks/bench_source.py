@@ -0,0 +1,75 @@
+"""
+Microbenchmark of the source data conversion.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_source [number of records]
+
+It prints the number of converted records per second for dictionary
+records (GitHub, GitLab, input files) and for object records (Jira).
+"""
+
+import sys
+import time
+
+from types import SimpleNamespace
+
+from synct.config import Column, Sheet
+from synct.source import SourceData
+
+RECORDS = 20000
+ROUNDS = 3
+
+COLUMNS = {
+    'Key': Column(data='key'),
+    'Summary': Column(data='fields.summary'),
+    'Status': Column(data='fields.status.name'),
+    'Assignee': Column(data='fields.assignee.name'),
+    'Priority': Column(data='fields.priority.name'),
+    'Labels': Column(data='fields.labels', delimiter=', '),
+    'Link': Column(data='key', link='https://example.com/browse/'),
+    'Missing': Column(data='fields.missing.name')
+}
+
+def dict_record(index):
+    """ Record with nested dictionaries """
+    return {
+        'key': 'TEST-' + str(index),
+        'fields': {
+            'summary': 'Summary of the issue ' + str(index),
+            'status': {'name': 'New'},
+            'assignee': {'name': 'user' + str(index % 10)},
+            'priority': {'name': 'Major'},
+            'labels': ['label1', 'label2']
+        }
+    }
+
+def object_record(index):
+    """ Record with nested attributes """
+    record = dict_record(index)
+    fields = record['fields']
+    return SimpleNamespace(key=record['key'], fields=SimpleNamespace(
+        summary=fields['summary'], status=SimpleNamespace(**fields['status']),
+        assignee=SimpleNamespace(**fields['assignee']),
+        priority=SimpleNamespace(**fields['priority']), labels=fields['labels']))
+
+def measure(records, sheet_config):
+    """ Get the best conversion rate in records per second """
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        SourceData(records, sheet_config)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(records) / best
+
+def main():
+    """ Run the benchmark """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else RECORDS
+    sheet_config = Sheet(columns=COLUMNS, key='Key')
+    for name, record in (('dict', dict_record), ('object', object_record)):
+        records = [record(index) for index in range(count)]
+        print(f'{name:8} {measure(records, sheet_config):12,.0f} records/s')
+
+if __name__ == '__main__':
+    main()
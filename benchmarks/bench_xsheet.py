@@ -0,0 +1,71 @@
+"""
+Benchmark of reading the CSV input file.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_xsheet [number of rows]
+
+It writes a semicolon separated file to a temporary directory and prints
+the reading time of the delimiter detected by the python engine on all
+the columns and of the input file read by synct with the columns used
+by the sheet.
+"""
+
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+
+from synct.config import Column, Sheet
+from synct.xsheet import Xsheet
+
+ROWS = 500000
+ROUNDS = 3
+
+HEADER = ['Key', 'Summary', 'Status', 'Owner', 'Priority', 'Component', 'Version', \
+        'Created', 'Updated', 'Description']
+SHEETS = {'TEST': Sheet(key='Key', columns={
+    'Key': Column(data='Key'),
+    'Summary': Column(data='Summary'),
+    'Owner': Column(data='Owner')
+})}
+QUERIES = {'TEST': "Status != 'Closed'"}
+
+def write_csv(file_name, rows):
+    """ Write the CSV file """
+    with open(file_name, 'w', encoding='utf-8') as csv_file:
+        csv_file.write(';'.join(HEADER) + '\n')
+        for index in range(rows):
+            csv_file.write(f'TEST-{index};Summary of the issue {index};New;user{index % 10};'
+                           f'Major;component{index % 7};1.{index % 5};2024-01-01;2024-02-01;'
+                           f'Description of the issue {index} with more words\n')
+
+def measure(read):
+    """ Get the best reading time in seconds """
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        read()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    """ Run the benchmark """
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = str(Path(directory) / 'input.csv')
+        write_csv(file_name, rows)
+        xsheet = Xsheet(SimpleNamespace(file=file_name, table=None, offset=None), None, None, 0)
+        before = measure(lambda: pd.read_csv(file_name, engine='python', sep=None, \
+                skiprows=0, keep_default_na=False))
+        after = measure(lambda: xsheet.read_input_file(SHEETS, QUERIES))
+    print(f'python engine, all columns {before:8.2f} s')
+    print(f'c engine, used columns     {after:8.2f} s')
+
+if __name__ == '__main__':
+    main()
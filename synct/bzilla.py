@@ -26,11 +26,15 @@ import os
 from xmlrpc.client import Fault
 
 from bugzilla import Bugzilla
+from bugzilla.bug import Bug
 
 import synct.logger as log
 
 API_KEY = 'api_key'
+INCLUDE_FIELDS = 'include_fields'
+LAST_CHANGE_TIME = 'last_change_time'
 LIMIT = 'limit'
+UTC_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
 OFFSET = 'offset'
 
 # Debug messages:
@@ -45,8 +49,15 @@ BUGZILLA_QUERY_FAILED = 'Bugzilla query failed in the configuration file for the
 class Bzilla:
     """ Bugzilla class """
 
-    def __init__(self, bzilla_domain, bzilla_url, bzilla_api_key):
-        """ Get bugzilla access using API key """
+    def __init__(self, bzilla_domain, bzilla_url, bzilla_api_key, offline=False):
+        """
+        Get bugzilla access using API key. The connection is not established
+        in the offline mode.
+        """
+        self.url = bzilla_url
+        if offline:
+            self.bzilla_access = Bugzilla(url=None)
+            return
         log.debug(ACCESS_BUGZILLA)
         self.path = os.path.expanduser(bzilla_api_key)
         self.config = configparser.ConfigParser()
@@ -59,9 +70,17 @@ class Bzilla:
             log.error(exception)
             log.error(BUGZILLA_CONNECTION_FAILURE)
 
-    def data_query(self, sheet, query):
-        """ Query to Bugzilla with pagination """
-        response_list = []
+    def data_pages(self, sheet, query, fields=None):
+        """
+        Query to Bugzilla page by page if the query sets the page limit.
+        Only the bug fields read by the sheet columns are requested unless
+        the query includes them.
+        """
+        query = dict(query)     # the query can be shared by more sheets
+        if fields and INCLUDE_FIELDS not in query:
+            query[INCLUDE_FIELDS] = self.bzilla_access.build_query( \
+                    include_fields=list(dict.fromkeys(field.split('.')[0] \
+                    for field in fields)))[INCLUDE_FIELDS]
         if LIMIT in query:
             limit = query[LIMIT]
         else:
@@ -77,7 +96,7 @@ class Bzilla:
                 log.fatal_error(exception)
             if len(response) == 0:
                 break                   # The query response is empty
-            response_list.extend(response)
+            yield response
             if len(response) < int(limit):
                 break                   # The query responded with less items than the page limit
             # Set next page query
@@ -85,7 +104,26 @@ class Bzilla:
                 query[OFFSET] = query[OFFSET] + len(response)
             else:
                 query[OFFSET] = len(response)
-        return response_list
+
+    def to_raw(self, bug):
+        """ Get raw bug data """
+        return bug.get_raw_data()
+
+    def from_raw(self, raw):
+        """ Get the bug from raw data """
+        return Bug(self.bzilla_access, dict=raw)
+
+    def incremental_query(self, query, since):
+        """ Restrict the query to the bugs changed since the time """
+        query = dict(query)
+        query[LAST_CHANGE_TIME] = since.strftime(UTC_TIME_FORMAT)
+        return query
+
+    def prepare(self, sheets, queries):
+        """ Bugzilla needs no preparation before the queries """
+
+    def report(self):
+        """ Bugzilla has no source statistics to report """
 
     def bzilla_logout(self):
         """ Bugzilla logout """
@@ -0,0 +1,226 @@
+"""
+synct reads data and copies in Google or Excel spreadsheet.
+
+    Copyright (C) 2024 Jan Beran <ari3s.git@gmail.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+synct.cache: Source response cache stored in a local directory
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import time
+
+import synct.logger as log
+
+CACHE_FILE_SUFFIX = '.json.gz'
+CACHE_PAGE_SIZE = 100   # cached records converted at once
+
+# Debug messages:
+CACHED_RESPONSE = 'cached response used for the sheet '
+CACHE_EVICTED = 'cache file evicted: '
+CACHE_STORED = 'response stored in the cache for the sheet '
+
+# Warning messages:
+CACHE_FILE_IGNORED = 'cache file is ignored: '
+CACHE_FILE_NOT_STORED = 'response is not stored in the cache: '
+
+# Error messages:
+MISSING_CACHED_RESPONSE = 'offline mode: no cached response for the sheet '
+
+class Cache:
+    """ Cache class """
+
+    def __init__(self, directory, ttl, max_size):
+        """
+        Set up the cache directory. The cached responses expire after ttl
+        seconds, the oldest ones are evicted above max_size bytes.
+        """
+        self.directory = pathlib.Path(os.path.expanduser(directory))
+        self.ttl = ttl
+        self.max_size = max_size
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        except OSError as exception:
+            log.fatal_error(exception)
+
+    def path(self, key):
+        """ Get the cache file of the key items """
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode('utf-8'))
+        return self.directory / (digest.hexdigest() + CACHE_FILE_SUFFIX)
+
+    def get(self, key, ignore_ttl=False):
+        """ Get the cached records or None if they are missing or expired """
+        path = self.path(key)
+        try:
+            if not ignore_ttl and time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            with gzip.open(path, 'rt', encoding='utf-8') as cache_file:
+                return json.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError) as exception:
+            log.warning(CACHE_FILE_IGNORED + str(path) + ': ' + str(exception))
+            return None
+
+    def put(self, key, records):
+        """ Store the records and evict the oldest files above the size limit """
+        path = self.path(key)
+        temp_name = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as temp_file:
+                temp_name = temp_file.name
+                with gzip.open(temp_file, 'wt', encoding='utf-8') as cache_file:
+                    json.dump(records, cache_file, separators=(',', ':'), default=str)
+            os.replace(temp_name, path)
+        except (OSError, TypeError, ValueError) as exception:
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
+            log.warning(CACHE_FILE_NOT_STORED + str(exception))
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the oldest files above the size limit. The expired files
+        are kept for the offline mode, get() applies the TTL.
+        """
+        files = []
+        for path in self.directory.glob('*' + CACHE_FILE_SUFFIX):
+            try:
+                files.append((path.stat().st_mtime, path.stat().st_size, path))
+            except FileNotFoundError:
+                continue
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_size:
+                break
+            try:
+                path.unlink()
+                log.debug(CACHE_EVICTED + str(path))
+            except FileNotFoundError:
+                pass
+            size = size - file_size
+
+class CacheFile:
+    """
+    Cache file written page by page. The records are written to a temporary
+    file that replaces the cache file after the last page, so only one page
+    of the records is kept in memory.
+    """
+
+    def __init__(self, cache, key):
+        """ Open the temporary file """
+        self.cache = cache
+        self.path = cache.path(key)
+        self.temp_name = None
+        self.cache_file = None
+        self.separator = '['
+        try:
+            with tempfile.NamedTemporaryFile(dir=cache.directory, delete=False) as temp_file:
+                self.temp_name = temp_file.name
+            self.cache_file = gzip.open(self.temp_name, 'wt', encoding='utf-8')
+        except OSError as exception:
+            self.discard(exception)
+
+    def write(self, records):
+        """ Write the records of one page """
+        if self.cache_file is None:
+            return
+        try:
+            for record in records:
+                self.cache_file.write(self.separator + \
+                        json.dumps(record, separators=(',', ':'), default=str))
+                self.separator = ','
+        except (OSError, TypeError, ValueError) as exception:
+            self.discard(exception)
+
+    def close(self):
+        """
+        Replace the cache file after the last page and evict the oldest
+        files above the size limit. Return True if the records are stored.
+        """
+        if self.cache_file is None:
+            return False
+        try:
+            self.cache_file.write('[]' if self.separator == '[' else ']')
+            self.cache_file.close()
+            self.cache_file = None
+            os.replace(self.temp_name, self.path)
+        except OSError as exception:
+            self.discard(exception)
+            return False
+        self.temp_name = None
+        self.cache.evict()
+        return True
+
+    def discard(self, exception=None):
+        """ Remove the temporary file of the records that are not stored """
+        if exception is not None:
+            log.warning(CACHE_FILE_NOT_STORED + str(exception))
+        if self.cache_file is not None:
+            try:
+                self.cache_file.close()
+            except OSError:
+                pass
+            self.cache_file = None
+        if self.temp_name and os.path.exists(self.temp_name):
+            os.remove(self.temp_name)
+        self.temp_name = None
+
+class CachedSource:
+    """
+    Source wrapper serving the query responses from the cache. The raw
+    records are cached and converted by the source to its usual objects.
+    """
+
+    def __init__(self, source, cache, offline):
+        """ Wrap the source """
+        self.source = source
+        self.cache = cache
+        self.offline = offline
+
+    def __getattr__(self, name):
+        """ Other source attributes are available unchanged """
+        return getattr(self.source, name)
+
+    def data_pages(self, sheet, query, fields=None):
+        """
+        Get the cached response or query the source and cache its response.
+        The source pages are passed on and written to the cache as they arrive.
+        """
+        key = [type(self.source).__name__, self.source.url, query, fields]
+        records = self.cache.get(key, self.offline)
+        if records is not None:
+            log.debug(CACHED_RESPONSE + sheet)
+            for start in range(0, len(records), CACHE_PAGE_SIZE):
+                yield [self.source.from_raw(record) \
+                        for record in records[start:start+CACHE_PAGE_SIZE]]
+            return
+        if self.offline:
+            log.fatal_error(MISSING_CACHED_RESPONSE + sheet)
+        cache_file = CacheFile(self.cache, key)
+        try:
+            for page in self.source.data_pages(sheet, query, fields):
+                cache_file.write(self.source.to_raw(item) for item in page)
+                yield page
+            if cache_file.close():
+                log.debug(CACHE_STORED + sheet)
+        finally:
+            cache_file.discard()       # the query failed or it was not completed
@@ -21,15 +21,14 @@ synct.config: Config access and operations
 
 from dataclasses import dataclass
 
+import importlib
+import math
 import pathlib
 import yaml
 
 import synct.logger as log
 
-from synct.bzilla import Bzilla
-from synct.git import Github, Gitlab
-from synct.jira import Jira
-from synct.xsheet import Xsheet
+from synct.cache import Cache, CachedSource
 
 BUGZILLA = 'BUGZILLA'
 API_KEY = 'API_KEY'
@@ -42,9 +41,27 @@ SEARCH_API = 'SEARCH_API'
 TOKEN = 'TOKEN'
 
 JIRA = 'JIRA'
+
+CACHE = 'CACHE'
+DIRECTORY = 'DIRECTORY'
+DEFAULT_DIRECTORY = '~/.cache/synct'
+ETAG_DIRECTORY = 'etag'
+TTL = 'TTL'
+DEFAULT_TTL = 3600
+MAX_SIZE = 'MAX_SIZE'
+DEFAULT_MAX_SIZE = 100
 SERVER = 'SERVER'
 
 FILE = 'FILE'
+
+# Source backends are imported only when they are used:
+SOURCE_MODULES = {
+    BUGZILLA: ('synct.bzilla', 'Bzilla'),
+    GITHUB: ('synct.git', 'Github'),
+    GITLAB: ('synct.git', 'Gitlab'),
+    JIRA: ('synct.jira', 'Jira'),
+    FILE: ('synct.xsheet', 'Xsheet')
+}
 TYPE = 'TYPE'
 SPREADSHEET = 'SPREADSHEET'
 FILE_NAME = 'FILE_NAME'
@@ -53,9 +70,22 @@ TABLE = 'TABLE'
 
 MAX_RESULTS = 'MAX_RESULTS'
 DEFAULT_MAX_RESULTS = 100
+MAX_WORKERS = 'MAX_WORKERS'
+DEFAULT_MAX_WORKERS = 1
+PARTITION = 'PARTITION'
+MAX_QUERIES = 'MAX_QUERIES'
+DEFAULT_MAX_QUERIES = 4
 QUERY = 'QUERY'
 
 SPREADSHEET_ID = 'SPREADSHEET_ID'
+FULL_SYNC_INTERVAL = 'FULL_SYNC_INTERVAL'
+DEFAULT_FULL_SYNC_INTERVAL = 7
+READ_QUOTA = 'READ_QUOTA'
+DEFAULT_READ_QUOTA = 60
+WRITE_QUOTA = 'WRITE_QUOTA'
+DEFAULT_WRITE_QUOTA = 60
+MAX_RETRIES = 'MAX_RETRIES'
+DEFAULT_MAX_RETRIES = 3
 SHEETS = 'SHEETS'
 NAME = 'NAME'
 
@@ -65,6 +95,8 @@ DEFAULT_COLUMNS = 'DEFAULT_COLUMNS'
 INIT_DEFAULT_COLUMNS = False
 INHERIT_FORMULAS = 'INHERIT_FORMULAS'
 INIT_INHERIT_FORMULAS = False
+ARROW_STRINGS = 'ARROW_STRINGS'
+INIT_ARROW_STRINGS = False
 SHEET_COLUMNS = 'SHEET_COLUMNS'
 SOURCE = 'SOURCE'
 FROM = 'FROM'
@@ -108,6 +140,7 @@ CONFIG_FILE_MISSING_JIRA_URL = 'Jira server url is not set in the config file'
 # Error messages - file:
 CONFIG_FILE_MISSING_FILE_TYPE = 'missing type of the input file'
 CONFIG_FILE_WRONG_FILE_TYPE = 'wrong type of the input file'
+CONFIG_FILE_WRONG_PARTITION = 'GitHub partition must be created or updated in the config file'
 
 # Error messages - target spreadsheet:
 CONFIG_FILE_MISSING_KEY = 'missing key in the config file'
@@ -126,6 +159,7 @@ class Sheet:
     inherit_formulas: bool = INIT_INHERIT_FORMULAS
     columns: dict = None
     key: str = None
+    arrow_strings: bool = INIT_ARROW_STRINGS
 
 @dataclass
 class Column:
@@ -155,6 +189,8 @@ class Config:   # pylint: disable=too-many-instance-attributes
         self.source = get_source(config_data, args)
         self.config_tsheet_type(config_data)
         self.config_tsheet(config_data, args)
+        self.full_sync_interval = float(get_config_with_default(config_data, \
+                FULL_SYNC_INTERVAL, DEFAULT_FULL_SYNC_INTERVAL))
         log.check_error()
 
     def config_tsheet(self, config_data, args):
@@ -198,6 +234,12 @@ class Config:   # pylint: disable=too-many-instance-attributes
                                              CONFIG_FILE_MISSING_SPREADSHEET)
             if not isinstance(self.spreadsheet_id, str):
                 log.fatal_error(CONFIG_FILE_WRONG_SPREADSHEET)
+            self.read_quota = int(get_config_with_default(config_data, READ_QUOTA, \
+                    DEFAULT_READ_QUOTA))
+            self.write_quota = int(get_config_with_default(config_data, WRITE_QUOTA, \
+                    DEFAULT_WRITE_QUOTA))
+            self.max_retries = int(get_config_with_default(config_data, MAX_RETRIES, \
+                    DEFAULT_MAX_RETRIES))
 
 def get_source(config_data, args):
     """ Get input presented in the config file """
@@ -205,7 +247,7 @@ def get_source(config_data, args):
     source = None
     if BUGZILLA in config_data:
         param = BUGZILLA
-        source = access_bugzilla(config_data)
+        source = access_bugzilla(config_data, args.offline)
     elif GITHUB in config_data:
         param = GITHUB
         source = access_github(config_data)
@@ -214,7 +256,7 @@ def get_source(config_data, args):
         source = access_gitlab(config_data)
     elif JIRA in config_data:
         param = JIRA
-        source = access_jira(config_data)
+        source = access_jira(config_data, args.offline)
     elif FILE in config_data:
         param = FILE
         source = access_xsheet(config_data, args)
@@ -225,9 +267,24 @@ def get_source(config_data, args):
     except KeyError:
         log.check_error()
     log.debug(param + ': ' + value_str)
+    if param != FILE:
+        source.max_queries = int(get_config_with_default(config_data[param], \
+                MAX_QUERIES, DEFAULT_MAX_QUERIES))
+        if CACHE in config_data or args.offline:
+            cache = access_cache(config_data)
+            if CACHE in config_data and param in (GITHUB, GITLAB):
+                # pages revalidated by ETag do not expire
+                source.etag_cache = Cache(cache.directory / ETAG_DIRECTORY, math.inf, \
+                        cache.max_size)
+            source = CachedSource(source, cache, args.offline)
     return source
 
-def access_bugzilla(config_data):
+def source_class(param):
+    """ Import the source backend module and get its class """
+    (module, name) = SOURCE_MODULES[param]
+    return getattr(importlib.import_module(module), name)
+
+def access_bugzilla(config_data, offline):
     """ Set up Bugzilla access """
     bugzilla_domain = get_config(config_data[BUGZILLA], DOMAIN, \
             CONFIG_FILE_MISSING_BUGZILLA_DOMAIN)
@@ -235,27 +292,44 @@ def access_bugzilla(config_data):
             CONFIG_FILE_MISSING_BUGZILLA_URL)
     bugzilla_api_key = get_config(config_data[BUGZILLA], API_KEY, \
             CONFIG_FILE_MISSING_BUGZILLA_API_KEY_FILE)
-    return Bzilla(bugzilla_domain, bugzilla_url, bugzilla_api_key)
+    return source_class(BUGZILLA)(bugzilla_domain, bugzilla_url, bugzilla_api_key, offline)
 
 def access_github(config_data):
     """ Set up GitHub access """
     github_url = get_config(config_data[GITHUB], SEARCH_API, CONFIG_FILE_MISSING_GITHUB_URL)
     github_token = get_config_with_default(config_data[GITHUB], TOKEN, None)
-    return Github(github_url, github_token)
+    github_partition = get_config_with_default(config_data[GITHUB], PARTITION, None)
+    if github_partition is not None:
+        github_partition = str(github_partition).lower()
+        if github_partition not in importlib.import_module('synct.git').PARTITIONS:
+            log.fatal_error(CONFIG_FILE_WRONG_PARTITION)
+    github_max_workers = int(get_config_with_default(config_data[GITHUB], \
+            MAX_WORKERS, DEFAULT_MAX_WORKERS))
+    return source_class(GITHUB)(github_url, github_token, github_partition, github_max_workers)
 
 def access_gitlab(config_data):
     """ Set up GitLab access """
     gitlab_url = get_config(config_data[GITLAB], SEARCH_API, CONFIG_FILE_MISSING_GITLAB_URL)
     gitlab_token = get_config(config_data[GITLAB], TOKEN, CONFIG_FILE_MISSING_GITLAB_TOKEN)
-    return Gitlab(gitlab_url, gitlab_token)
+    return source_class(GITLAB)(gitlab_url, gitlab_token)
 
-def access_jira(config_data):
+def access_jira(config_data, offline):
     """ Set up Jira access """
     jira_server = get_config(config_data[JIRA], SERVER, CONFIG_FILE_MISSING_JIRA_URL)
     jira_token = get_config(config_data[JIRA], TOKEN, CONFIG_FILE_MISSING_JIRA_TOKEN)
     jira_max_results = int(get_config_with_default(config_data[JIRA], \
             MAX_RESULTS, DEFAULT_MAX_RESULTS))
-    return Jira(jira_server, jira_token, jira_max_results)
+    jira_max_workers = int(get_config_with_default(config_data[JIRA], \
+            MAX_WORKERS, DEFAULT_MAX_WORKERS))
+    return source_class(JIRA)(jira_server, jira_token, jira_max_results, jira_max_workers, offline)
+
+def access_cache(config_data):
+    """ Set up the source response cache """
+    cache_data = config_data.get(CACHE) or {}
+    directory = get_config_with_default(cache_data, DIRECTORY, DEFAULT_DIRECTORY)
+    ttl = float(get_config_with_default(cache_data, TTL, DEFAULT_TTL))
+    max_size = float(get_config_with_default(cache_data, MAX_SIZE, DEFAULT_MAX_SIZE))
+    return Cache(directory, ttl, max_size * 1024 * 1024)
 
 def access_xsheet(config_data, args):
     """ Set up input file access and parameters """
@@ -264,7 +338,7 @@ def access_xsheet(config_data, args):
     name = get_config_with_default(config_data[FILE], FILE_NAME, None)
     table = get_config_with_default(config_data[FILE], TABLE, None)
     offset = get_config_with_default(config_data[FILE], OFFSET, DEFAULT_HEADER_OFFSET)
-    return Xsheet(args, name, table, offset)
+    return source_class(FILE)(args, name, table, offset)
 
 def get_sheet_config(config_data, spreadsheet):
     """ Get target sheet params """
@@ -275,6 +349,7 @@ def get_sheet_config(config_data, spreadsheet):
         delimiter = spreadsheet.delimiter
         default_columns = spreadsheet.default_columns
         inherit_formulas = spreadsheet.inherit_formulas
+        arrow_strings = spreadsheet.arrow_strings
         key = spreadsheet.key
         for column in spreadsheet.columns:
             columns[column] = spreadsheet.columns[column]
@@ -283,6 +358,7 @@ def get_sheet_config(config_data, spreadsheet):
         delimiter = DEFAULT_DELIMITER
         default_columns = INIT_DEFAULT_COLUMNS
         inherit_formulas = INIT_INHERIT_FORMULAS
+        arrow_strings = INIT_ARROW_STRINGS
     if HEADER_OFFSET in config_data:
         header_offset = int(config_data[HEADER_OFFSET])
     if DELIMITER in config_data:
@@ -291,6 +367,8 @@ def get_sheet_config(config_data, spreadsheet):
             column.delimiter = delimiter
     if DEFAULT_COLUMNS in config_data:
         default_columns = config_data[DEFAULT_COLUMNS]
+    if ARROW_STRINGS in config_data:
+        arrow_strings = config_data[ARROW_STRINGS]
     if INHERIT_FORMULAS in config_data:
         inherit_formulas = config_data[INHERIT_FORMULAS]
         for _, column in columns.items():
@@ -307,7 +385,8 @@ def get_sheet_config(config_data, spreadsheet):
         inherit_formulas = spreadsheet.inherit_formulas
         columns = spreadsheet.columns
         key = spreadsheet.key
-    return Sheet(header_offset, delimiter, default_columns, inherit_formulas, columns, key)
+    return Sheet(header_offset, delimiter, default_columns, inherit_formulas, columns, key, \
+            arrow_strings)
 
 def get_column_param(c_data, param, default):
     """ Get column parameter that can have also a default value """
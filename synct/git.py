@@ -21,17 +21,48 @@ synct.git: GitHub and GitLab access and operations
 
 import json
 import os
+import threading
+
+from datetime import datetime, timedelta, timezone
+from time import sleep, time
+
 import requests
 
+from requests.adapters import HTTPAdapter
+
 import synct.logger as log
 
+from synct.pool import worker_pool
+
 TIMEOUT = 10    # in seconds
+POOL_MAXSIZE = 10   # connections kept alive per host
 ERROR = 'error'
+UTC_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# GitHub search results limit handling:
+SEARCH_RESULTS_LIMIT = 1000
+SEARCH_START = datetime(2008, 1, 1, tzinfo=timezone.utc)   # before any GitHub item
+MIN_WINDOW = timedelta(seconds=1)
+PARTITIONS = ('created', 'updated')
+
+# Rate limit handling:
+RATE_LIMIT_PREFIXES = ('X-RateLimit-', 'RateLimit-')    # GitHub, GitLab
+RATE_LIMITED_STATUS_CODES = (403, 429)
+RETRY_AFTER = 'Retry-After'
+PACING_RATIO = 0.1      # part of the limit when the requests are spread until the reset
+RESET_MARGIN = 1        # in seconds, covers the clock difference
+MAX_RATE_LIMIT_RETRIES = 3
 
 # Debug messages:
 GET_GIT_TOKEN = ': get token'
 GIT_QUERY = ' query: '
 GIT_RESPONSE_HEADERS = ' response headers: '
+GIT_NOT_MODIFIED = ' not modified, cached page used: '
+GIT_RATE_LIMITED = ' request rate limited, retry in seconds: '
+
+# Info messages:
+GIT_RATE_LIMIT_PAUSE = ' rate limit exhausted, requests paused until the reset (seconds): '
+GIT_PAUSED_REQUESTS = ' requests paused to keep the rate limit (seconds): '
 
 # Error messages:
 GIT_QUERY_FAILED = ': query failed in the configuration file for the sheet '
@@ -39,6 +70,82 @@ FATAL_ERROR = ': fatal error'
 
 # Warning messages:
 GIT_INCOMPLETE_RESULTS = ': incomplete_results'
+GIT_RESULTS_LIMIT = ': only the first results are available, total count: '
+
+class RateLimit:
+    """
+    Pacing of the requests by the rate limit headers of the responses.
+    The remaining requests are spread until the reset time when they run
+    low, the requests pause until the reset time when they are exhausted.
+    """
+
+    def __init__(self):
+        """ The rate limit is unknown before the first response """
+        self.lock = threading.Lock()
+        self.limit = None
+        self.remaining = None
+        self.reset = None               # epoch time in seconds
+        self.paused = 0                 # total waiting time in seconds
+
+    def update(self, headers):
+        """ Take the rate limit from the response headers """
+        for prefix in RATE_LIMIT_PREFIXES:
+            try:
+                remaining = int(headers[prefix + 'Remaining'])
+                reset = float(headers[prefix + 'Reset'])
+                limit = int(headers.get(prefix + 'Limit', remaining))
+            except (KeyError, TypeError, ValueError):
+                continue
+            with self.lock:
+                (self.limit, self.remaining, self.reset) = (limit, remaining, reset)
+            return
+
+    def acquire(self):
+        """
+        Wait before the request if the remaining requests are running low.
+        Return the pause until the reset time or None. The wait is computed
+        under the lock, the other threads are not blocked while it lasts.
+        """
+        with self.lock:
+            if self.remaining is None:
+                return None
+            until_reset = self.reset + RESET_MARGIN - time()
+            if until_reset <= 0:
+                self.remaining = None   # the limit has been reset
+                return None
+            pause = None
+            if self.remaining <= 0:
+                pause = until_reset
+                wait = until_reset
+                self.remaining = None
+            elif self.remaining <= self.limit * PACING_RATIO:
+                wait = until_reset / self.remaining
+                self.remaining = self.remaining - 1
+            else:
+                self.remaining = self.remaining - 1
+                return None
+            self.paused = self.paused + wait
+        sleep(wait)
+        return pause
+
+    def wait(self, seconds):
+        """ Wait after the rate limited request """
+        with self.lock:
+            self.paused = self.paused + seconds
+            self.remaining = None
+        sleep(seconds)
+
+    def retry_after(self, headers):
+        """ Get the delay required by the server or the time until the reset """
+        try:
+            return max(float(headers[RETRY_AFTER]), 0)
+        except (KeyError, TypeError, ValueError):
+            pass
+        self.update(headers)
+        with self.lock:
+            if self.remaining == 0:
+                return max(self.reset + RESET_MARGIN - time(), 0)
+        return None
 
 class Git:
     """ Git class """
@@ -46,9 +153,15 @@ class Git:
     def __init__(self, url):
         """ Get Git access using API key """
         self.git = None
-        self.headers = None
         self.link = None
         self.url = url
+        self.etag_cache = None      # cache of the pages validated by ETag
+        self.rate_limit = RateLimit()
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': 'gzip'})
+        adapter = HTTPAdapter(pool_maxsize=POOL_MAXSIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def get_token(self, token_file_name):
         """ Get token from the file """
@@ -63,45 +176,187 @@ class Git:
                 log.error(self.git + ': ' + exception)
         return token
 
-    def data_query(self, sheet, query):
-        """ Query to Git with paging """
-        request = self.url + query
-        response_list = []
+    def data_pages(self, sheet, query, fields=None):     # pylint: disable=unused-argument
+        """
+        Query to Git page by page. The search APIs do not support
+        the fields projection, so the complete items are returned.
+        """
+        yield from self.next_pages(sheet, self.url + query)
+
+    def next_pages(self, sheet, request):
+        """ Get the pages following the next page links from the request """
         while len(request) > 0:
-            log.debug(self.git + GIT_QUERY + request)
-            try:
-                response = requests.get(request, headers=self.headers, timeout=TIMEOUT)
-            except (AttributeError, TypeError, requests.RequestException) as exception:
-                log.error(exception)
-                log.error(self.git + GIT_QUERY_FAILED + sheet + ': ' + request)
-            log.debug(self.git + GIT_RESPONSE_HEADERS + str(response.headers))
-            if not response.ok:
-                self.error_message(response)
-            log.check_error()
-            try:
-                response_list.extend(self.data_response(response.json()))
-                request = find_between(response.headers[self.link], '<', '>; rel="next"')
-            except (KeyError, TypeError):
-                log.error(self.git + GIT_QUERY_FAILED + sheet + ': ' + request)
+            (items, request, _) = self.query_page(sheet, request)
+            yield items
+
+    def query_page(self, sheet, request):
+        """
+        Get the items of one page, the request of the next page and the parsed
+        page. The last page has no next page link, the next request is empty.
+        """
+        log.debug(self.git + GIT_QUERY + request)
+        try:
+            (page, headers) = self.get_page(request)
+        except (AttributeError, TypeError, requests.RequestException) as exception:
+            log.error(exception)
+            log.error(self.git + GIT_QUERY_FAILED + sheet + ': ' + request)
+        log.check_error()
+        try:
+            items = self.data_response(page)
+            next_request = find_between(headers.get(self.link, ''), '<', '>; rel="next"')
+        except (KeyError, TypeError):
+            log.error(self.git + GIT_QUERY_FAILED + sheet + ': ' + request)
+        log.check_error()
+        return (items, next_request, page)
+
+    def get_page(self, request):
+        """
+        Get the parsed page and its headers. The cached page is
+        revalidated by its ETag, the unchanged page is not transferred
+        again and the request does not count against the rate limit.
+        """
+        key = [self.git, request]
+        cached = self.etag_cache.get(key) if self.etag_cache else None
+        headers = {'If-None-Match': cached['etag']} if cached else None
+        response = self.rate_limited_get(request, headers)
+        if cached and response.status_code == requests.codes.not_modified:
+            log.debug(self.git + GIT_NOT_MODIFIED + request)
+            return (cached['page'], cached['headers'])
+        if not response.ok:
+            self.error_message(response)
             log.check_error()
-        return response_list
+        page = response.json()
+        if self.etag_cache and 'ETag' in response.headers:
+            headers = {self.link: response.headers[self.link]} \
+                    if self.link in response.headers else {}
+            self.etag_cache.put(key, {'etag': response.headers['ETag'], 'page': page, \
+                    'headers': headers})
+        return (page, response.headers)
+
+    def rate_limited_get(self, request, headers):
+        """
+        Send the request paced by the rate limit. The rate limited request
+        is repeated after the delay required by the server.
+        """
+        count = 0
+        while True:
+            count = count + 1
+            pause = self.rate_limit.acquire()
+            if pause:
+                log.info(self.git + GIT_RATE_LIMIT_PAUSE + f'{pause:.1f}')
+            response = self.session.get(request, headers=headers, timeout=TIMEOUT)
+            log.debug(self.git + GIT_RESPONSE_HEADERS + str(response.headers))
+            if response.status_code in RATE_LIMITED_STATUS_CODES \
+                    and count <= MAX_RATE_LIMIT_RETRIES:
+                wait = self.rate_limit.retry_after(response.headers)
+                if wait is not None:
+                    log.debug(self.git + GIT_RATE_LIMITED + f'{wait:.1f}')
+                    self.rate_limit.wait(wait)
+                    continue
+            self.rate_limit.update(response.headers)
+            return response
+
+    def prepare(self, sheets, queries):
+        """ Git needs no preparation before the queries """
+
+    def report(self):
+        """ Report the time of the paused requests """
+        if self.rate_limit.paused:
+            log.info(self.git + GIT_PAUSED_REQUESTS + f'{self.rate_limit.paused:.1f}')
 
     def data_response(self, resp):
         """ Git data response """
 
+    def to_raw(self, item):
+        """ Get raw item data, the items are kept as parsed JSON """
+        return item
+
+    def from_raw(self, raw):
+        """ Get the item from raw data """
+        return raw
+
+    def incremental_query(self, query, since):
+        """ Restrict the query to the items updated since the time """
+
     def error_message(self, resp):
         """ Git error message output """
 
 class Github(Git):
     """ GitHub class """
 
-    def __init__(self, url, token_file_name):
-        """ Get GitHub access using API key """
+    def __init__(self, url, token_file_name, partition=None, max_workers=1):
+        """
+        Get GitHub access using API key. If the partition is set, the search
+        queries are split into windows of the created or updated time.
+        """
         Git.__init__(self, url)
         self.git = 'GitHub'
         self.link = 'Link'
+        self.partition = partition
+        self.max_workers = max_workers
         token = Git.get_token(self, token_file_name)
-        self.headers = {'Authorization': 'Token ' + token} if token else ''
+        if token:
+            self.session.headers.update({'Authorization': 'Token ' + token})
+
+    def incremental_query(self, query, since):
+        """ Add the updated qualifier to the search terms """
+        updated = '+updated:%3E%3D' + since.astimezone(timezone.utc).strftime(UTC_TIME_FORMAT)
+        return add_search_terms(query, updated)
+
+    def data_pages(self, sheet, query, fields=None):
+        """
+        Query to GitHub page by page. The search API provides only the first
+        1000 results. In the partition mode, the query is split into time
+        windows that are halved until each one fits into the limit. The windows
+        of one round are queried concurrently, their items are yielded in the
+        order of the windows and de-duplicated by their id.
+        """
+        if not self.partition or add_search_terms(query, '') is None:
+            (items, request, page) = self.query_page(sheet, self.url + query)
+            self.check_results_limit(page)
+            yield items
+            yield from self.next_pages(sheet, request)
+            return
+        windows = [(SEARCH_START, datetime.now(timezone.utc) + MIN_WINDOW)]
+        ids = set()
+        window_query = log.with_buffer(lambda window: self.window_query(sheet, query, *window))
+        with worker_pool(self.max_workers) as executor:
+            while windows:
+                split = []
+                responses = executor.map(window_query, windows)
+                for (start, end), response in zip(windows, responses):
+                    if response is None:
+                        middle = start + (end - start) / 2
+                        split.extend([(start, middle), (middle, end)])
+                        continue
+                    items = []
+                    for item in response:
+                        if item['id'] not in ids:
+                            ids.add(item['id'])
+                            items.append(item)
+                    yield items
+                windows = split
+
+    def window_query(self, sheet, query, start, end):
+        """
+        Query the items in the time window. Return None if the window
+        exceeds the results limit and it can be split.
+        """
+        request = self.url + add_search_terms(query, '+' + self.partition + ':' \
+                + start.strftime(UTC_TIME_FORMAT) + '..' + end.strftime(UTC_TIME_FORMAT))
+        (items, request, page) = self.query_page(sheet, request)
+        if page.get('total_count', 0) > SEARCH_RESULTS_LIMIT and end - start > MIN_WINDOW:
+            return None
+        self.check_results_limit(page)
+        response_list = list(items)
+        for items in self.next_pages(sheet, request):
+            response_list.extend(items)
+        return response_list
+
+    def check_results_limit(self, page):
+        """ Warn if only the first results of the query are available """
+        if page.get('total_count', 0) > SEARCH_RESULTS_LIMIT:
+            log.warning(self.git + GIT_RESULTS_LIMIT + str(page['total_count']))
 
     def data_response(self, resp):
         """ GitHub data response """
@@ -109,6 +364,8 @@ class Github(Git):
             response = resp['items']
         except KeyError:
             log.fatal_error(self.git + FATAL_ERROR)
+        if resp.get('incomplete_results'):
+            log.warning(self.git + GIT_INCOMPLETE_RESULTS)
         return response
 
     def error_message(self, resp):
@@ -126,7 +383,13 @@ class Gitlab(Git):
         self.git = 'GitLab'
         self.link = 'link'
         token = Git.get_token(self, token_file_name)
-        self.headers = {'PRIVATE-TOKEN': token} if token else ''
+        if token:
+            self.session.headers.update({'PRIVATE-TOKEN': token})
+
+    def incremental_query(self, query, since):
+        """ Add the updated_after parameter to the query """
+        updated = 'updated_after=' + since.astimezone(timezone.utc).strftime(UTC_TIME_FORMAT)
+        return query + ('&' if '?' in query else '?') + updated
 
     def data_response(self, resp):
         """ GitLab data response """
@@ -158,3 +421,12 @@ def find_between(string, first_string, last_string):
         return string[start:]
     except ValueError:
         return ''
+
+def add_search_terms(query, terms):
+    """ Add the terms to the search query, None if the query has no search terms """
+    (path, separator, params) = query.partition('?')
+    params = params.split('&')
+    if not separator or not any(param.startswith('q=') for param in params):
+        return None
+    return path + separator + '&'.join(param + terms if param.startswith('q=') else param \
+            for param in params)
@@ -22,10 +22,11 @@ synct.gsheet: Google spreadsheet access and operations
 
 import os
 
+from string import ascii_uppercase
 from stat import S_IRUSR, S_IWUSR
 
 from json.decoder import JSONDecodeError
-from time import sleep
+from time import monotonic, sleep
 
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
@@ -34,10 +35,11 @@ from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 
+import numpy as np
 import pandas as pd
 
 import synct.logger as log
-from synct.tsheet import Tsheet
+from synct.tsheet import Tsheet, changed_cells
 
 CREDENTIALS_JSON = 'credentials.json'
 GOOGLE_APPLICATION_CREDENTIALS = 'GOOGLE_APPLICATION_CREDENTIALS'
@@ -48,16 +50,26 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 # Write requests limit handling:
 INITIAL_DELAY = 1
 DELAY_MULTIPLIER = 2
-MAX_DELAY_COUNT = 4
+RETRY_AFTER = 'retry-after'
+
+# Maximum number of requests in one batchUpdate:
+MAX_BATCH_REQUESTS = 500
 
 # Debug messages:
+BATCH_UPDATE = 'batch update requests: '
+REQUEST_FAILED = 'Google request failed, retry in seconds: '
 ACCESS_GOOGLE_SPREADSHEET = 'access Google spreadsheet'
 ADD_ROWS_GOOGLE_SHEET = 'add rows in Google sheet: '
 GOT_GOOGLE_SPREADSHEET_ACCESS = 'got Google spreadsheet access'
 GOT_GOOGLE_SPREADSHEET_ATTRIBUTES = 'got Google spreadsheet attributes'
 LINK_UPDATE = 'link update: '
 READ_GOOGLE_SHEET = 'read Google sheet: '
+READ_GOOGLE_SHEETS = 'read Google sheets: '
 UPDATE_GOOGLE_SHEET = 'update Google sheet: '
+CHANGED_CELLS = ' changed cells: '
+
+# Info messages:
+THROTTLED_REQUESTS = 'Google requests throttled to keep the quota (seconds): '
 
 # Error messages:
 SPREADSHEET_CONNECTION_FAILURE = 'failed to establish Google spreadsheet connection'
@@ -68,12 +80,44 @@ WRONG_HEADER_OFFSET = 'header offset could be wrong in the sheet '
 GOOGLE_AUTHORIZATION_ERROR = 'Google authorization error'
 INSUFFICIENT_TOKEN = 'Insufficient Google token file: '
 
+class Quota:
+    """
+    Token bucket pacing the requests to keep the per-minute quota.
+    The bucket is refilled continuously up to the quota.
+    """
+
+    def __init__(self, requests_per_minute):
+        """ Set up the full bucket """
+        self.capacity = max(1, requests_per_minute)
+        self.rate = self.capacity / 60      # tokens per second
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.throttled = 0                  # total waiting time in seconds
+
+    def acquire(self):
+        """ Take a token, wait for it if the bucket is empty """
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+            self.throttled = self.throttled + wait
+            self.tokens = 1
+            self.updated = monotonic()
+        self.tokens = self.tokens - 1
+
 class Gsheet(Tsheet):
     """ Google spreadsheet class """
 
     def __init__(self, config):
         """ Acccess the spreadsheet and read data """
         self.spreadsheet_id = config.spreadsheet_id
+        self.raw_data = {}
+        self.requests = []      # collected batchUpdate requests
+        self.read_quota = Quota(config.read_quota)
+        self.write_quota = Quota(config.write_quota)
+        self.max_retries = config.max_retries
         self.access_spreadsheet()
         Tsheet.__init__(self, config)
 
@@ -128,6 +172,7 @@ class Gsheet(Tsheet):
             log.fatal_error(error)
         # Get attributes of the spreadsheet
         try:
+            self.read_quota.acquire()
             spreadsheet = self.spreadsheet_access.get(spreadsheetId=self.spreadsheet_id, ranges=[],
                     includeGridData=False).execute()
             log.debug(GOT_GOOGLE_SPREADSHEET_ATTRIBUTES)
@@ -141,17 +186,38 @@ class Gsheet(Tsheet):
         for sheet in spreadsheet['sheets']:
             self.sheet_id[sheet['properties']['title']] = sheet['properties']['sheetId']
 
-    def get_sheet_data(self, sheet):
-        """ Read sheet data """
-        log.debug(READ_GOOGLE_SHEET + "'" + sheet + "'")
-        self.data[sheet] = None
+    def read_sheets(self):
+        """
+        Read data of all active sheets by one request. If it fails,
+        the sheets are read one by one to report the failed ones.
+        """
+        log.debug(READ_GOOGLE_SHEETS + str(self.active_sheets))
         try:
-            raw_data = self.spreadsheet_access.values().get(
-                    spreadsheetId=self.spreadsheet_id,
-                    range=sheet, valueRenderOption='FORMULA').execute().get('values', [])
+            self.read_quota.acquire()
+            value_ranges = self.spreadsheet_access.values().batchGet(
+                    spreadsheetId=self.spreadsheet_id, ranges=self.active_sheets,
+                    valueRenderOption='FORMULA').execute().get('valueRanges', [])
         except (HttpError, TimeoutError) as error:
-            log.error(error)
+            log.debug(error)
             return
+        for sheet, value_range in zip(self.active_sheets, value_ranges):
+            self.raw_data[sheet] = value_range.get('values', [])
+
+    def get_sheet_data(self, sheet):
+        """ Read sheet data """
+        self.data[sheet] = None
+        if sheet in self.raw_data:
+            raw_data = self.raw_data.pop(sheet)
+        else:
+            log.debug(READ_GOOGLE_SHEET + "'" + sheet + "'")
+            try:
+                self.read_quota.acquire()
+                raw_data = self.spreadsheet_access.values().get(
+                        spreadsheetId=self.spreadsheet_id,
+                        range=sheet, valueRenderOption='FORMULA').execute().get('values', [])
+            except (HttpError, TimeoutError) as error:
+                log.error(error)
+                return
         # Normalize raw_data to the same length of the header
         header_offset = self.sheets_config[sheet].header_offset
         try:
@@ -176,61 +242,61 @@ class Gsheet(Tsheet):
     def insert_rows(self, sheet, start_row, inserted_rows):
         """ Insert empty rows in the spreadsheet """
         log.debug(ADD_ROWS_GOOGLE_SHEET + "'" + sheet + "'")
-        body = {
-            'requests': [
-                {
-                    'insertDimension': {
-                        'range': {
-                            'sheetId': self.sheet_id[sheet],
-                            'dimension': 'ROWS',
-                            'startIndex': start_row,
-                            'endIndex': start_row+inserted_rows
-                        },
-                        'inheritFromBefore': start_row > self.sheets_config[sheet].header_offset + 2
-                    }
-                }
-            ]
-        }
-        self.request_operation(self.spreadsheet_access.batchUpdate, body)
+        self.requests.append({
+            'insertDimension': {
+                'range': {
+                    'sheetId': self.sheet_id[sheet],
+                    'dimension': 'ROWS',
+                    'startIndex': start_row,
+                    'endIndex': start_row+inserted_rows
+                },
+                'inheritFromBefore': start_row > self.sheets_config[sheet].header_offset + 2
+            }
+        })
 
     def delete_rows(self, sheet, start_row, deleted_rows):
         """ Delete rows in the spreadsheet """
-        body = {
-            'requests': [
-                {
-                    'deleteDimension': {
-                        'range': {
-                            'sheetId': self.sheet_id[sheet],
-                            'dimension': 'ROWS',
-                            'startIndex': start_row,
-                            'endIndex': start_row+deleted_rows
-                        }
-                    }
+        self.requests.append({
+            'deleteDimension': {
+                'range': {
+                    'sheetId': self.sheet_id[sheet],
+                    'dimension': 'ROWS',
+                    'startIndex': start_row,
+                    'endIndex': start_row+deleted_rows
                 }
-            ]
-        }
-        self.request_operation(self.spreadsheet_access.batchUpdate, body)
+            }
+        })
 
     def update_spreadsheet(self):
-        """ Update the Google spreadsheet data without header """
+        """
+        Update the Google spreadsheet data without header. Only the blocks
+        of cells changed against the original data are sent by one request
+        after the rows are inserted.
+        """
+        data = []
         for sheet in self.active_sheets:
             if len(self.data[sheet].index) > self.rows[sheet]:
                 self.insert_rows(sheet, \
                         self.sheets_config[sheet].header_offset+self.rows[sheet]+2, \
                         len(self.data[sheet])-self.rows[sheet])
-            log.debug(UPDATE_GOOGLE_SHEET + "'" + sheet + "'")
+            mask = changed_cells(self.data[sheet], self.original_data[sheet])
+            log.debug(UPDATE_GOOGLE_SHEET + "'" + sheet + "'" + CHANGED_CELLS + str(mask.sum()))
+            first_row = self.sheets_config[sheet].header_offset + 2
+            for (start_row, end_row, start_col, end_col) in changed_blocks(mask):
+                data.append({
+                    'range': sheet_range(sheet, first_row+start_row, start_col, \
+                            first_row+end_row, end_col),
+                    'majorDimension': 'ROWS',
+                    'values': self.data[sheet].iloc[start_row:end_row+1, \
+                            start_col:end_col+1].values.tolist()
+                })
+        self.flush_requests()       # insert rows before the values are written
+        if data:
             body = {
                 'valueInputOption': 'USER_ENTERED',
-                'data': [
-                       {
-                            'range': sheet+'!A'+str(self.sheets_config[sheet].header_offset+2),
-                            'majorDimension': 'ROWS',
-                            'values': self.data[sheet].values.tolist()
-                        }
-                    ]
-                }
-            if not self.request_operation(self.spreadsheet_access.values().batchUpdate, body):
-                return
+                'data': data
+            }
+            self.request_operation(self.spreadsheet_access.values().batchUpdate, body)
 
     def update_column_with_links(self, sheet, column, link):
         """ Update the column in the Google sheet with links """
@@ -241,48 +307,73 @@ class Gsheet(Tsheet):
         for row in self.data[sheet].index:
             rows.append({'values': {'userEnteredFormat': {'textFormat': {'link': {'uri': \
                         link + str(self.data[sheet][column][row])}}}}})
-        body = {
-            'requests': [
-                {
-                    'updateCells': {
-                        'rows': rows,
-                        'fields': 'userEnteredFormat.textFormat.link.uri',
-                        'range': {
-                            'sheetId': self.sheet_id[sheet],
-                            'startRowIndex': header_offset+1,
-                            'endRowIndex': len(self.data[sheet].index)+header_offset+1,
-                            'startColumnIndex': col,
-                            'endColumnIndex': col+1
-                        }
-                    }
+        self.requests.append({
+            'updateCells': {
+                'rows': rows,
+                'fields': 'userEnteredFormat.textFormat.link.uri',
+                'range': {
+                    'sheetId': self.sheet_id[sheet],
+                    'startRowIndex': header_offset+1,
+                    'endRowIndex': len(self.data[sheet].index)+header_offset+1,
+                    'startColumnIndex': col,
+                    'endColumnIndex': col+1
                 }
-            ]
-        }
-        self.request_operation(self.spreadsheet_access.batchUpdate, body)
+            }
+        })
+
+    def save(self):
+        """ Send the remaining collected requests and report the throttling """
+        self.flush_requests()
+        throttled = self.read_quota.throttled + self.write_quota.throttled
+        if throttled:
+            log.info(THROTTLED_REQUESTS + f'{throttled:.1f}')
+
+    def flush_requests(self):
+        """
+        Send the collected row insertions, deletions and link updates in their
+        order by batchUpdate requests of limited size.
+        """
+        for start in range(0, len(self.requests), MAX_BATCH_REQUESTS):
+            log.debug(BATCH_UPDATE + str(len(self.requests[start:start+MAX_BATCH_REQUESTS])))
+            body = {'requests': self.requests[start:start+MAX_BATCH_REQUESTS]}
+            if not self.request_operation(self.spreadsheet_access.batchUpdate, body):
+                break
+        self.requests = []
 
     def request_operation(self, operation, body):
         """
         Handle batchUpdate request with preventing to exceed the limit of
-        'Write requests per minute per user'. If the request is not successful,
-        it is repeated with a delay more times. The delay value is increased
-        exponentially in the next round.
+        'Write requests per minute per user'. The requests are paced by
+        the write quota. If the request is not successful, it is repeated
+        up to the retry limit after the delay required by the server or
+        after the delay increased exponentially in the next round.
         """
         delay = INITIAL_DELAY                       # the initial delay after the first error
         count = 0                                   # counter of the operation requests
-        while count < MAX_DELAY_COUNT:
+        while True:
             count = count + 1
+            self.write_quota.acquire()
             try:
                 response = operation(
                         spreadsheetId=self.spreadsheet_id, body=body).execute()
                 log.debug(response)
                 return True                         # successful operation
             except (HttpError, TimeoutError) as error:
-                if count >= MAX_DELAY_COUNT:
+                if count > self.max_retries:
                     log.fatal_error(error)
                     return False                    # unsuccessful operation
-                sleep(delay)                        # delay in sec
+                wait = retry_after(error, delay)
+                log.debug(REQUEST_FAILED + str(wait))
+                sleep(wait)                         # delay in sec
+                self.write_quota.throttled = self.write_quota.throttled + wait
                 delay = DELAY_MULTIPLIER * delay    # prolong the next delay
-        return False                                # unsuccessful, this way should never happen
+
+def retry_after(error, delay):
+    """ Get the delay required by the server or the default one """
+    try:
+        return max(float(error.resp[RETRY_AFTER]), 0)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return delay
 
 def get_cred_files():
     """
@@ -302,3 +393,43 @@ def get_cred_files():
     (root, _) = os.path.splitext(credentials_json)
     token_json = root + TOKEN_JSON
     return (credentials_json, credentials_json_status.st_mode & FILE_PERMISSIONS_MASK, token_json)
+
+def column_letters(col):
+    """ Convert the column index (from 0) to the A1 notation letters """
+    letters = ''
+    col = col + 1
+    while col:
+        col, remainder = divmod(col - 1, len(ascii_uppercase))
+        letters = ascii_uppercase[remainder] + letters
+    return letters
+
+def sheet_range(sheet, start_row, start_col, end_row, end_col):
+    """ Get the A1 notation of the cell block, rows are numbered from 1 """
+    return "'" + sheet.replace("'", "''") + "'!" + \
+            column_letters(start_col) + str(start_row) + ':' + \
+            column_letters(end_col) + str(end_row)
+
+def changed_blocks(mask):
+    """
+    Merge the changed cells into rectangular blocks. The changed cells
+    in a row form spans that are joined with the same spans in the next rows.
+    Return the list of blocks (start row, end row, start column, end column).
+    """
+    blocks = []
+    previous_spans = {}     # spans of the previous row with their block index
+    previous_row = None
+    for row in np.flatnonzero(mask.any(axis=1)):
+        edges = np.diff(np.concatenate(([0], mask[row].astype(np.int8), [0])))
+        spans = {}
+        for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1):
+            span = (int(start), int(end))
+            if previous_row == row - 1 and span in previous_spans:
+                block = previous_spans[span]
+                blocks[block][1] = int(row)
+            else:
+                block = len(blocks)
+                blocks.append([int(row), int(row), span[0], span[1]])
+            spans[span] = block
+        previous_spans = spans
+        previous_row = row
+    return [tuple(block) for block in blocks]
@@ -21,51 +21,156 @@ synct.jira: Jira access and operations
 """
 
 import os
+import re
+
+from time import sleep
 
 from jira import JIRA, JIRAError
+from jira.resources import Issue
 
 import synct.logger as log
 
+from synct.pool import worker_pool
+
+# Throttled requests handling:
+INITIAL_DELAY = 1
+DELAY_MULTIPLIER = 2
+MAX_DELAY_COUNT = 5
+RETRY_AFTER = 'Retry-After'
+THROTTLED_STATUS_CODES = (429, 503)
+
 # Debug messages:
 ACCESS_JIRA = 'access Jira'
 GET_JIRA_TOKEN = 'get Jira token'
 JIRA_QUERY = 'Jira query: '
+JIRA_QUERY_PAGE = 'Jira query page: startAt = '
+JIRA_THROTTLED = 'Jira request throttled, retry in seconds: '
 
 # Error messages:
 JIRA_AUTH_FAILED = 'Jira authorization failed'
 JIRA_QUERY_FAILED = 'Jira query failed in the configuration file for the sheet '
 
+# Incremental query:
+JQL_ORDER_BY = re.compile(r'(^|\s+)ORDER\s+BY\s', re.IGNORECASE)
+JQL_TIME_FORMAT = '%Y/%m/%d %H:%M'
+
+# Issue attributes available without the fields projection
+ISSUE_ATTRIBUTES = ('id', 'key', 'self')
+ISSUE_FIELDS = 'fields'
+
 class Jira:
     """ Jira class """
 
-    def __init__(self, url, token_file_name, max_results):
-        """ Access Jira """
+    def __init__(self, url, token_file_name, max_results, \
+            max_workers=1, offline=False):          # pylint: disable=too-many-arguments
+        """ Access Jira, the access is not established in the offline mode """
+        self.url = url
+        self.access = None
+        self.max_results = max_results
+        self.max_workers = max_workers
+        if offline:
+            return
         token = self.get_token(token_file_name)
         try:
             self.access = JIRA(options={'server': url}, token_auth=token)
             log.debug(ACCESS_JIRA)
         except (JIRAError, AttributeError):
             log.error(JIRA_AUTH_FAILED)
-        self.max_results = max_results
 
-    def data_query(self, sheet, query):
-        """ Get data required from Jira server with pagination """
-        response_list = []
-        start_at = 0            # index of the first returned item
-        total = 1               # initial value that will be updated by Jira response in the cycle
-        while start_at < total:
-            log.debug(JIRA_QUERY + query)
-            try:
-                response = self.access.search_issues(jql_str=query, startAt=start_at, \
-                        maxResults=self.max_results)
-            except (JIRAError, AttributeError) as exception:
+    def data_pages(self, sheet, query, fields=None):
+        """
+        Get data required from Jira server page by page. The failed query
+        is reported once all the page requests have finished.
+        """
+        log.debug(JIRA_QUERY + query)
+        try:
+            yield from self.query_pages(query, jira_fields(fields))
+        except (JIRAError, AttributeError) as exception:
+            if self.access:
                 self.access.close()
-                log.error(JIRA_QUERY_FAILED + sheet + ':\n' + query)
-                log.fatal_error(exception)
-            response_list.extend(response)
+            log.error(JIRA_QUERY_FAILED + sheet + ':\n' + query)
+            log.fatal_error(exception)
+
+    def query_pages(self, query, fields):
+        """
+        Get the pages of the query response. The first page provides
+        the total number of items. If more workers are allowed, the following
+        pages are requested concurrently, at most one page per worker ahead,
+        and yielded in order. Only the issue fields read by the sheet columns
+        are requested.
+        """
+        response = self.search_page(query, 0, fields)
+        start_at = len(response.iterable)   # index of the first item of the next page
+        total = response.total
+        yield response
+        if self.max_workers > 1 and 0 < start_at < total:
+            page_starts = range(start_at, total, start_at)
+            with worker_pool(self.max_workers) as executor:
+                for index in range(0, len(page_starts), self.max_workers):
+                    yield from executor.map(log.with_buffer(lambda page_start: \
+                            self.search_page(query, page_start, fields)), \
+                            page_starts[index:index+self.max_workers])
+            return
+        while 0 < start_at < total:
+            response = self.search_page(query, start_at, fields)
+            if len(response.iterable) == 0:
+                break
             start_at = start_at + len(response.iterable)
             total = response.total
-        return response_list
+            yield response
+
+    def to_raw(self, issue):
+        """ Get raw issue data """
+        return issue.raw
+
+    def from_raw(self, raw):
+        """ Get the issue from raw data """
+        return Issue({'server': self.url}, None, raw=raw)
+
+    def incremental_query(self, query, since):
+        """
+        Restrict the JQL query to the issues updated since the time.
+        Jira evaluates the time in the time zone of the user.
+        """
+        order_by = ''
+        match = JQL_ORDER_BY.search(query)
+        if match:
+            order_by = ' ' + query[match.end(1):]
+            query = query[:match.start()]
+        updated = 'updated >= "' + since.astimezone().strftime(JQL_TIME_FORMAT) + '"'
+        if query.strip():
+            updated = '(' + query + ') AND ' + updated
+        return updated + order_by
+
+    def prepare(self, sheets, queries):
+        """ Jira needs no preparation before the queries """
+
+    def report(self):
+        """ Jira has no source statistics to report """
+
+    def search_page(self, query, start_at, fields=None):
+        """
+        Get one page of the query response. If the request is throttled
+        by the server, it is repeated after the delay required by the server
+        or after the delay increased exponentially in the next round.
+        The failed request raises the error to the consumer of the page.
+        """
+        log.debug(JIRA_QUERY_PAGE + str(start_at))
+        delay = INITIAL_DELAY
+        count = 0
+        while True:
+            count = count + 1
+            try:
+                return self.access.search_issues(jql_str=query, startAt=start_at, \
+                        maxResults=self.max_results, fields=fields)
+            except JIRAError as exception:
+                if exception.status_code not in THROTTLED_STATUS_CODES or \
+                        count >= MAX_DELAY_COUNT:
+                    raise
+                wait = retry_after(exception, delay)
+                log.debug(JIRA_THROTTLED + str(wait))
+                sleep(wait)
+                delay = DELAY_MULTIPLIER * delay
 
     def get_token(self, token_file_name):
         """ Get token from the file """
@@ -76,3 +181,27 @@ class Jira:
         except OSError as exception:
             log.error(exception)
         return token
+
+def jira_fields(fields):
+    """
+    Get the comma separated issue fields from the source data items.
+    None (all fields) is returned if any item is out of the issue fields.
+    """
+    if not fields:
+        return None
+    names = []
+    for field in fields:
+        parts = field.split('.')
+        if parts[0] == ISSUE_FIELDS and len(parts) > 1:
+            if parts[1] not in names:
+                names.append(parts[1])
+        elif parts[0] not in ISSUE_ATTRIBUTES:
+            return None
+    return ','.join(names) if names else None
+
+def retry_after(exception, delay):
+    """ Get the delay required by the server or the default one """
+    try:
+        return max(float(exception.response.headers[RETRY_AFTER]), 0)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return delay
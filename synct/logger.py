@@ -23,6 +23,9 @@ synct.logger: Logging handling
 import logging
 import os
 import sys
+import threading
+
+from contextlib import contextmanager
 
 # Debug messages:
 SCRIPT_TERMINATED = 'script terminated'
@@ -45,6 +48,65 @@ class ErrorFlag:
 
 ERROR_FLAG = ErrorFlag()        # Define the error flag
 
+_thread_data = threading.local()    # messages buffered by the current thread
+
+class Records(list):
+    """
+    Buffered messages with their own error flag, so an error reported
+    in one buffer does not terminate the threads of the other buffers.
+    """
+    def __init__(self):
+        """ Set the initial error flag of the buffer """
+        super().__init__()
+        self.error_flag = ErrorFlag()
+
+def error_flag():
+    """ Get the error flag of the current buffer or the global one """
+    records = getattr(_thread_data, 'records', None)
+    return ERROR_FLAG if records is None else records.error_flag
+
+@contextmanager
+def buffered(records=None):
+    """
+    Buffer messages reported by the current thread instead of logging them.
+    The buffered messages can be reported later by replay(). The records
+    of another thread are shared if they are given.
+    """
+    previous = getattr(_thread_data, 'records', None)
+    _thread_data.records = Records() if records is None else records
+    try:
+        yield _thread_data.records
+    finally:
+        _thread_data.records = previous
+
+def with_buffer(function):
+    """
+    Get the function reporting messages to the buffer of the current thread,
+    so the messages of the worker threads are kept with the caller ones.
+    """
+    records = getattr(_thread_data, 'records', None)
+    if records is None:
+        return function
+    def buffered_function(*args, **kwargs):
+        with buffered(records):
+            return function(*args, **kwargs)
+    return buffered_function
+
+def replay(records):
+    """ Report the buffered messages and merge their error flag """
+    for level, message in records:
+        log.log(level, message)
+    if records.error_flag.check():
+        error_flag().set()
+
+def report(level, message):
+    """ Report the message or buffer it if buffering is enabled in the thread """
+    records = getattr(_thread_data, 'records', None)
+    if records is None:
+        log.log(level, message)
+    else:
+        records.append((level, message))
+
 def setup(verbosity):
     """ Transform the verbosity from CLI to logging level """
     base_loglevel = 30
@@ -58,32 +120,32 @@ def setup(verbosity):
 
 def fatal_error(error_message):
     """ Report the error and terminate as failed """
-    log.error(error_message)
-    log.debug(SCRIPT_TERMINATED)
+    report(logging.ERROR, error_message)
+    report(logging.DEBUG, SCRIPT_TERMINATED)
     sys.exit(1)
 
 def check_error():
     """ If error flag is set then teminate the script """
-    if ERROR_FLAG.check():
-        log.debug(SCRIPT_TERMINATED)
+    if error_flag().check():
+        report(logging.DEBUG, SCRIPT_TERMINATED)
         sys.exit(1)
 
 def error(error_message):
     """ Report the error and terminate as failed """
-    ERROR_FLAG.set()
-    log.error(error_message)
+    error_flag().set()
+    report(logging.ERROR, error_message)
 
 def warning(warning_message):
     """ Report the warning """
-    log.warning(warning_message)
+    report(logging.WARNING, warning_message)
 
 def info(info_message):
     """ Report the info """
-    log.info(info_message)
+    report(logging.INFO, info_message)
 
 def debug(debug_message):
     """ Report the warning """
-    log.debug(debug_message)
+    report(logging.DEBUG, debug_message)
 
 def debug_level():
     """ Check debug level """
@@ -0,0 +1,38 @@
+"""
+synct reads data and copies in Google or Excel spreadsheet.
+
+    Copyright (C) 2024 Jan Beran <ari3s.git@gmail.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+synct.pool: Worker threads stopped at the first failure
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+@contextmanager
+def worker_pool(max_workers):
+    """
+    Thread pool of the workers. If the consumer of the results fails or it is
+    interrupted (Ctrl+C), the queued tasks are cancelled and the running ones
+    are not waited for.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        yield executor
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
@@ -23,14 +23,17 @@ synct.source: Source data operations
 import builtins
 import re
 
+from functools import lru_cache
 from pprint import pformat
 
+import numpy as np
 import pandas as pd
 import synct.logger as log
 
 SOURCE_DATA_KEY = 'SOURCE DATA: key = '
 
 # Warning messages:
+ARROW_STRINGS_NOT_AVAILABLE = 'pyarrow is not available, source data are stored as objects'
 DUPLICATED_TARGET_COLUMN_NAME = 'duplicated column name in the target sheet '
 MISSING_IN_THE_TARGET_SPREADSHEET = 'missing in the target spreadsheet'
 
@@ -39,16 +42,37 @@ class SourceData:
     data = {}
     key_dict = {}
     used_key = {}
+    target_index = None
+    partial = False     # only source items updated since the last run
 
     def __init__(self, source_data, sheet_config, target_sheet_name=None, target_sheet=None):
-        """ Convert source data """
+        """
+        Convert source data. The source items are converted one by one into
+        the column values, so they can be consumed from a stream. More items
+        can be added later by add_items() followed by update_data().
+        """
         self.key_dict = {}
         self.used_key = {}
-        converted_data = []
-        columns_list = create_columns_list(sheet_config, target_sheet_name, target_sheet)
-        index = 0
+        self.target_index = None
+        self.data = None
+        self.length = 0
+        self.sheet_config = sheet_config
+        self.target_sheet = target_sheet
+        self.columns_list = create_columns_list(sheet_config, target_sheet_name, target_sheet)
+        self.values = [[] for _ in self.columns_list]
+        if target_sheet is not None:
+            self.target_index = target_key_index(target_sheet, sheet_config.key)
+        self.plan = ExtractionPlan(sheet_config, self.columns_list, target_sheet, \
+                self.target_index)
+        self.add_items(source_data)
+        self.update_data()
+
+    def add_items(self, source_data):
+        """ Convert the source items to the column values """
+        plan = self.plan
+        index = self.length
         for source_item in source_data:
-            key_value = get_value(source_item, sheet_config, sheet_config.key)
+            key_value = plan.key(source_item)
             if key_value is None:
                 continue
             if not isinstance(key_value, str):
@@ -59,20 +83,41 @@ class SourceData:
                 except TypeError:
                     continue
             display_source_record(source_item, key_value, index)
-            row = get_columns(source_item, sheet_config, target_sheet, key_value, columns_list)
             self.key_dict[key_value] = index
             index = index + 1
             self.used_key[key_value] = False
-            converted_data.append(list(row.values()))
-        self.data = pd.DataFrame(converted_data[0:], index=range(0, len(converted_data)), \
-                                 columns=columns_list)
+            plan.add_row(source_item, key_value, self.values)
+        self.length = index
+
+    def update_data(self):
+        """
+        Append the column values added since the last update to the data
+        and release them. The string columns are stored in Arrow arrays
+        if it is enabled.
+        """
+        dtype = arrow_string_dtype() if self.sheet_config.arrow_strings else None
+        columns = {}
+        for position, values in enumerate(self.values):
+            if dtype is not None and all(isinstance(value, str) for value in values):
+                columns[position] = pd.array(values, dtype=dtype)
+            else:
+                columns[position] = values
+        start = 0 if self.data is None else len(self.data)
+        data = pd.DataFrame(columns, index=range(start, self.length))
+        data.columns = self.columns_list
+        self.values = [[] for _ in self.columns_list]
+        if start == 0:
+            self.data = data
+        elif len(data) > 0:
+            self.data = pd.concat([self.data, data])
 
     def check_missing_keys(self, sheet, key, sheet_config, enable_add):
         """ Check missing keys in source data """
         missing_keys = []
+        optional = self.optional_rows(sheet_config)
         for key_value, used in self.used_key.items():
-            if not used:
-                if self.found_key(sheet_config, key_value):
+            if not used and (self.target_index is None or key_value not in self.target_index):
+                if optional[self.key_dict[key_value]]:
                     continue
                 missing_keys.append(str(key_value))
                 message = key + ': ' + str(key_value) + ': ' + \
@@ -83,34 +128,136 @@ class SourceData:
                     log.warning(message)
         return missing_keys
 
-    def found_key(self, sheet_config, key_value):
-        """ Return the key is (not) found """
-        key_index = self.key_dict[key_value]
-        found = False
+    def optional_rows(self, sheet_config):
+        """
+        Get the mask of the rows matching the optional pattern of any column.
+        The rows are not required in the target sheet.
+        """
+        optional = np.zeros(len(self.data), dtype=bool)
         for column in self.data.columns:
+            config = sheet_config.columns.get(column)
+            if config is None or not config.optional:
+                continue            # not configured default column or no option
             try:
-                option = sheet_config.columns[column].optional
-                if option:
-                    if re.match(option, self.data.loc[key_index, (column)]):
-                        found = True
-                        break
-            except KeyError:        # not configured default column
+                matched = self.data[column].str.match(compiled(config.optional), na=False)
+            except AttributeError:  # no string values in the column
                 continue
-        return found
-
-def cell_init_value(target_sheet, column, sheet_config, key_value):
-    """ Set an initial value of the cell """
-    value = ''
-    if target_sheet is not None and column in target_sheet.columns:
-        target_row = None
-        # Find a row with the key
-        for row in target_sheet.index:
-            if str(target_sheet.loc[row, (sheet_config.key)]) == str(key_value):
-                target_row = row
-                break
-        if target_row is not None:         # original value in the default column
-            value = target_sheet.loc[target_row, (column)]
-    return value
+            optional = optional | matched.to_numpy(dtype=bool)
+        return optional
+
+class ExtractionPlan:
+    """
+    Extraction of the sheet columns from the source items. The columns are
+    compiled once per sheet into the value getters and the conversions,
+    the plan is run per source item.
+    """
+
+    def __init__(self, sheet_config, columns_list, target_sheet=None, target_index=None):
+        """ Compile the columns """
+        self.key = compile_getter(column_path(sheet_config, sheet_config.key))
+        self.target_sheet = target_sheet
+        self.target_index = target_index
+        self.columns = []
+        for column in columns_list:
+            self.columns.append((compile_getter(column_path(sheet_config, column)), \
+                    compile_converter(sheet_config, column), initial_getter(target_sheet, column)))
+
+    def add_row(self, source_item, key_value, values):
+        """ Append the column values of the source item to the column lists """
+        position = None
+        if self.target_index is not None:
+            target_row = self.target_index.get(key_value)
+            if target_row is not None:
+                position = self.target_sheet.index.get_loc(target_row)
+        for (getter, convert, initial), column_values in zip(self.columns, values):
+            value = getter(source_item)
+            if value is None:
+                column_values.append('' if initial is None or position is None \
+                        else initial(position))
+            else:
+                column_values.append(convert(value, source_item))
+
+
+def column_path(sheet_config, column):
+    """ Get the source data item (dotted path) of the column """
+    if column in sheet_config.columns:
+        return sheet_config.columns[column].data
+    return column           # default column named by the source data item
+
+def compile_converter(sheet_config, column):
+    """
+    Compile the conversion of the column value to a string. Only the columns
+    with links or gets need the complete evaluation.
+    """
+    config = sheet_config.columns.get(column)
+    column_is_key = column == sheet_config.key
+    if config is not None and (config.gets or config.link and not column_is_key):
+        return lambda value, source_item: evaluate(value, config, source_item, column_is_key)
+    delimiter = sheet_config.delimiter if config is None else config.delimiter
+    def convert(value, _):
+        if isinstance(value, list):
+            return delimiter.join(map(str, value))
+        return str(value)
+    return convert
+
+def initial_getter(target_sheet, column):
+    """
+    Get the getter of the original value of the column in the target sheet
+    row given by its position, or None if the target sheet has no such column.
+    """
+    if target_sheet is None or column not in target_sheet.columns:
+        return None
+    if isinstance(target_sheet.columns.get_loc(column), int):
+        return target_sheet[column].to_numpy().__getitem__
+    return lambda position: target_sheet.iloc[position][column]    # duplicated column name
+
+def compile_getter(path):
+    """
+    Compile the getter of the source data item given by the dotted path.
+    Each part is a key of a dictionary or an attribute of an object.
+    """
+    parts = tuple(str(path).split('.'))
+    def getter(source_item):
+        for part in parts:
+            if isinstance(source_item, dict):
+                source_item = source_item.get(part)
+            else:
+                source_item = getattr(source_item, part, None)
+            if source_item is None:
+                return None
+        return source_item
+    return getter
+
+@lru_cache(maxsize=None)
+def arrow_string_dtype():
+    """ Get the Arrow string type or None if pyarrow is not available """
+    try:
+        return pd.StringDtype('pyarrow')
+    except ImportError:
+        log.warning(ARROW_STRINGS_NOT_AVAILABLE)
+        return None
+
+@lru_cache(maxsize=None)
+def compiled(pattern):
+    """ Get the compiled regular expression shared by all the sheets """
+    return re.compile(pattern)
+
+def source_fields(sheet_config):
+    """
+    Get the source data items (dotted paths) read by the sheet columns.
+    None is returned if default columns can read any source data item.
+    """
+    if sheet_config.default_columns:
+        return None
+    return sorted({str(column.data) for column in sheet_config.columns.values() \
+            if column.data})
+
+def target_key_index(target_sheet, key):
+    """ Map the key values of the target sheet to the first row containing them """
+    index = {}
+    for row, key_value in zip(target_sheet.index, target_sheet[key].tolist()):
+        index.setdefault(str(key_value), row)
+    return index
 
 def create_columns_list(sheet_config, target_sheet_name, target_sheet):
     """ Create a columns list """
@@ -138,55 +285,6 @@ def display_source_record(source_item, key_value, index):
                 sd_string = pformat(getattr(source_item, attr))
     log.debug(SOURCE_DATA_KEY + key_value + '\n' + sd_string)
 
-def get_columns(source_item, sheet_config, target_sheet, key_value, columns_list):
-    """ Get column values in the row """
-    row = {}
-    for column in columns_list:
-        row[column] = cell_init_value(target_sheet, column, sheet_config, key_value)
-        config_column = column in sheet_config.columns
-        value = get_value(source_item, sheet_config, column)
-        if value is None:
-            continue
-        if not isinstance(value, str):
-            try:
-                iter(value)
-            except TypeError:
-                pass
-        if config_column:
-            row[column] = evaluate(value, sheet_config.columns[column], source_item, \
-                    column == sheet_config.key)
-        elif isinstance(value, list):
-            row[column] = sheet_config.delimiter.join(map(str, value))
-        else:
-            row[column] = str(value)
-    return row
-
-def get_value(source_item, sheet_config, column):
-    """ Get value from source, handling nested keys or attributes via dot notation. """
-    # Try to retrieve the key from sheet_config.columns[column].data if column is an index
-    if column in sheet_config.columns:
-        key = sheet_config.columns[column].data
-    else:
-        # If column is not an index, assume it's the direct key or path
-        key = column
-    # Split the key by dots to handle nested attributes or keys
-    parts = key.split('.')
-    # Traverse the source_item for each part in the key path
-    for part in parts:
-        if isinstance(source_item, dict):
-            # If source_item is a dictionary, attempt to get the next part as a key
-            source_item = source_item.get(part)
-        else:
-            # If source_item is an object, attempt to get the next part as an attribute
-            if hasattr(source_item, part):
-                source_item = getattr(source_item, part)
-            else:
-                return None                 # If attribute or key is missing, return None
-        # If at any point source_item becomes None, return None
-        if source_item is None:
-            return None
-    return source_item
-
 def trans_value(config, conf_item_keys_list, source_item):
     """ Get and transform value from Jira to fit with other formats """
     value = []
@@ -211,7 +309,7 @@ def parse_gets(gets, config, conf_item_keys_list, conf_item, s_data):
     flag = False
     for key in conf_item_keys_list:
         if key in s_data:
-            if re.match(conf_item[key], s_data[key]):
+            if compiled(conf_item[key]).match(s_data[key]):
                 if flag:
                     gets_item = gets_item + config.delimiter2
                 gets_item = gets_item + s_data[key]
@@ -0,0 +1,119 @@
+"""
+synct reads data and copies in Google or Excel spreadsheet.
+
+    Copyright (C) 2024 Jan Beran <ari3s.git@gmail.com>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+synct.state: Incremental sync state stored in a local file
+"""
+
+import hashlib
+import json
+import pathlib
+
+from datetime import datetime, timedelta, timezone
+
+import synct.logger as log
+
+STATE_FILE_SUFFIX = '.state.json'
+WATERMARK = 'watermark'
+FULL_SYNC = 'full_sync'
+QUERY_HASH = 'query_hash'
+
+# Records updated shortly before the watermark are fetched again to cover
+# clock differences and sources evaluating the time in a local time zone.
+WATERMARK_OVERLAP = timedelta(days=1)
+
+# Debug messages:
+READ_STATE_FILE = 'read state file: '
+SAVE_STATE_FILE = 'save state file: '
+
+# Info messages:
+FULL_SYNC_SHEET = 'full sync of the sheet '
+INCREMENTAL_SYNC_SHEET = 'incremental sync of the sheet '
+UPDATED_SINCE = ', records updated since '
+
+# Warning messages:
+STATE_FILE_IGNORED = 'state file is ignored: '
+STATE_FILE_NOT_SAVED = 'state file is not saved: '
+
+class State:
+    """ Incremental sync state class """
+
+    def __init__(self, config_file, full_sync_interval):
+        """
+        Read the state file stored next to the config file. The watermark
+        is the time when the sheet data were read by the last successful run.
+        """
+        path = pathlib.Path(config_file)
+        self.file_name = str(path.with_name(path.stem + STATE_FILE_SUFFIX))
+        self.full_sync_interval = timedelta(days=full_sync_interval)
+        self.started = datetime.now(timezone.utc)
+        self.synced = {}            # sheets synced in this run: full sync flag
+        self.query_hashes = {}      # sheets synced in this run: hash of the query
+        self.sheets = {}
+        log.debug(READ_STATE_FILE + self.file_name)
+        try:
+            with open(self.file_name, encoding='utf-8') as state_file:
+                self.sheets = json.load(state_file)
+        except FileNotFoundError:
+            pass
+        except (OSError, UnicodeDecodeError, ValueError) as exception:
+            log.warning(STATE_FILE_IGNORED + self.file_name + ': ' + str(exception))
+
+    def since(self, sheet, query):
+        """
+        Return the time since when the updated records are required,
+        or None if the full sync of the sheet is required. The full sync
+        is also required if the query of the sheet has changed.
+        """
+        try:
+            watermark = datetime.fromisoformat(self.sheets[sheet][WATERMARK])
+            full_sync = datetime.fromisoformat(self.sheets[sheet][FULL_SYNC])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if self.sheets[sheet].get(QUERY_HASH) != query_hash(query):
+            return None
+        if self.started - full_sync >= self.full_sync_interval:
+            return None
+        return watermark - WATERMARK_OVERLAP
+
+    def sync(self, sheet, since, query):
+        """ Register the sheet sync of the query, full sync if the time is None """
+        if since is None:
+            log.info(FULL_SYNC_SHEET + sheet)
+        else:
+            log.info(INCREMENTAL_SYNC_SHEET + sheet + UPDATED_SINCE + since.isoformat())
+        self.synced[sheet] = since is None
+        self.query_hashes[sheet] = query_hash(query)
+
+    def save(self):
+        """ Store the watermarks of the synced sheets """
+        for sheet, full_sync in self.synced.items():
+            self.sheets.setdefault(sheet, {})[WATERMARK] = self.started.isoformat()
+            self.sheets[sheet][QUERY_HASH] = self.query_hashes[sheet]
+            if full_sync:
+                self.sheets[sheet][FULL_SYNC] = self.started.isoformat()
+        log.debug(SAVE_STATE_FILE + self.file_name)
+        try:
+            with open(self.file_name, 'w', encoding='utf-8') as state_file:
+                json.dump(self.sheets, state_file, indent=2)
+        except OSError as exception:
+            log.warning(STATE_FILE_NOT_SAVED + str(exception))
+
+def query_hash(query):
+    """ Get the hash identifying the query and the fields of the sheet """
+    return hashlib.sha256(json.dumps(query, sort_keys=True, default=str).encode('utf-8')) \
+            .hexdigest()
@@ -20,6 +20,7 @@ synct reads data and copies in Google or Excel spreadsheet.
 
 import argparse
 import importlib
+import json
 import os
 import signal
 import sys
@@ -27,16 +28,15 @@ import sys
 from importlib.metadata import version, PackageNotFoundError
 from pathlib import Path
 
-import pyperclip
-
-import pandas as pd
-
 import synct.logger as log
 
 from synct.config import Config
+from synct.pool import worker_pool
 #from synct.gsheet import Gsheet
-from synct.source import SourceData
-from synct.tsheet import update_target_row_data
+
+# pyperclip, pandas and the modules using pandas (source, tsheet) are imported
+# where they are used, so the argument parsing and --version do not load them.
+# pylint: disable=import-outside-toplevel
 
 PROG = Path(__file__).stem
 VERSION_FILE = 'VERSION'
@@ -83,6 +83,10 @@ def get_cli_parameters():
             help='enable removing items in the target spreadsheet')
     parser.add_argument('-n', '--noupdate', action='store_true',
             help='disable target spreadsheet update')
+    parser.add_argument('-i', '--incremental', action='store_true',
+            help='get only source items updated since the last run')
+    parser.add_argument('--offline', action='store_true',
+            help='get source data only from the cache')
     parser.add_argument('-f', '--file', type=str, default=None,
             help='file name of data source')
     parser.add_argument('-t', '--table', type=str, default=None,
@@ -109,23 +113,115 @@ def get_version():
             ver = 'unknown version'
     return ver
 
-def get_data(config, target_spreadsheet):
-    """ Get source data """
-    source_data = {}
+def query_key(source, query):
+    """ Get the key identifying the query to the source """
+    if isinstance(query, dict):
+        query = json.dumps(query, sort_keys=True, default=str)
+    else:
+        query = str(query).strip()
+    return type(source).__name__ + ': ' + query
+
+def incremental_queries(config, state):
+    """
+    Get the sheet queries. In the incremental mode, the queries are restricted
+    to the items updated since the last run if the source supports it.
+    """
+    from synct.source import source_fields
+    queries = {}
     for sheet_name, query in config.queries.items():
-        if config.sheets[sheet_name].default_columns:
-            source_data[sheet_name] = SourceData( \
-                config.source.data_query(sheet_name, query), \
-                config.sheets[sheet_name], sheet_name, target_spreadsheet.data[sheet_name])
-        else:
-            source_data[sheet_name] = SourceData( \
-                config.source.data_query(sheet_name, query), \
-                config.sheets[sheet_name])
+        queries[sheet_name] = query
+        if state is None:
+            continue
+        sheet_query = [query, source_fields(config.sheets[sheet_name])]
+        since = state.since(sheet_name, sheet_query)
+        if since is not None:
+            incremental_query = config.source.incremental_query(query, since)
+            if incremental_query is None:
+                since = None
+            else:
+                queries[sheet_name] = incremental_query
+        state.sync(sheet_name, since, sheet_query)
+    return queries
+
+def query_sheets(config, sheet_queries):
+    """
+    Group the sheets with the same query. Return the query, the source fields
+    required by all the sheets in the group and the sheet names per query key.
+    """
+    from synct.source import source_fields
+    queries = {}
+    for sheet_name, query in sheet_queries.items():
+        key = query_key(config.source, query)
+        fields = source_fields(config.sheets[sheet_name])
+        sheet_names = []
+        if key in queries:
+            query, group_fields, sheet_names = queries[key]
+            # None means all fields
+            fields = None if fields is None or group_fields is None else \
+                    sorted(set(group_fields) | set(fields))
+        sheet_names.append(sheet_name)
+        queries[key] = (query, fields, sheet_names)
+    return queries
+
+def query_sheet(config, target_spreadsheet, query, fields, sheet_names):
+    """
+    Run the query of the sheets and buffer the reported messages. The response
+    pages are converted to the source data of all the sheets as they arrive,
+    so only one page of the source items is kept at once. Return the source
+    data per sheet, the messages and the exit code if the query failed.
+    """
+    from synct.source import SourceData
+    with log.buffered() as records:
+        try:
+            source_data = {}
+            for sheet_name in sheet_names:
+                if config.sheets[sheet_name].default_columns:
+                    source_data[sheet_name] = SourceData((), config.sheets[sheet_name], \
+                            sheet_name, target_spreadsheet.data[sheet_name])
+                else:
+                    source_data[sheet_name] = SourceData((), config.sheets[sheet_name])
+            for page in config.source.data_pages(sheet_names[0], query, fields):
+                for sheet_data in source_data.values():
+                    sheet_data.add_items(page)
+            for sheet_data in source_data.values():
+                sheet_data.update_data()
+        except SystemExit as exception:
+            return None, records, exception.code
+    return source_data, records, None
+
+def get_data(config, target_spreadsheet, state=None):
+    """
+    Get source data. Each distinct query is sent once and its response is
+    converted for all the sheets using it. The queries run concurrently up to
+    the limit of the source, messages are reported in the order of the sheets
+    followed by the source statistics. The first failed query stops the others.
+    Source data of incrementally synced sheets are marked as partial.
+    """
+    converted = {}
+    sheet_queries = incremental_queries(config, state)
+    queries = query_sheets(config, sheet_queries)
+    max_workers = max(1, min(len(queries), config.source.max_queries))
+    config.source.prepare(config.sheets, config.queries)
+    with worker_pool(max_workers) as executor:
+        futures = [executor.submit(query_sheet, config, target_spreadsheet, *query) \
+                for query in queries.values()]
+        for future in futures:
+            sheets_data, records, code = future.result()
+            log.replay(records)
+            if code is not None:
+                sys.exit(code)      # the queued queries are cancelled
+            converted.update(sheets_data)
+        config.source.report()
+    source_data = {}
+    for sheet_name in config.queries:
+        source_data[sheet_name] = converted[sheet_name]
+        source_data[sheet_name].partial = state is not None and not state.synced[sheet_name]
     log.check_error()
     return source_data
 
 def keep_formula(cell):
     """ Keep formula and ignore anything else """
+    import pandas as pd
     result = None
     if isinstance(cell, str) and len(cell) > 0 and cell[0] == '=':
         result = cell
@@ -170,19 +266,30 @@ def get_formula(source, target, sheet_name):
 
 def transform_data(source, target, args):
     """ Copy transformed data from the source to the target spreadsheet """
+    import pyperclip
+    from synct.source import target_key_index
+    from synct.tsheet import append_target_rows, update_target_rows
     missing_all_target_key_values = []
     for sheet_name in target.active_sheets:
         key = target.sheets_config[sheet_name].key
-        # Update target sheet data
-        for row in target.data[sheet_name].index:
-            try:
-                key_value = str(target.data[sheet_name][key][row])
-            except KeyError as exception:
-                log.error(exception)
-                log.fatal_error(UNKNOWN_KEY + sheet_name)
+        try:
+            if source[sheet_name].target_index is None:
+                source[sheet_name].target_index = target_key_index(target.data[sheet_name], key)
+            target_keys = target.data[sheet_name][key].tolist()
+        except KeyError as exception:
+            log.error(exception)
+            log.fatal_error(UNKNOWN_KEY + sheet_name)
+        # Match target rows with source data
+        target_rows = []
+        source_rows = []
+        for position, (row, key_value) in enumerate(zip(target.data[sheet_name].index, \
+                map(str, target_keys))):
             if key_value in source[sheet_name].key_dict:
-                key_index = source[sheet_name].key_dict[key_value]
+                target_rows.append(position)
+                source_rows.append(source[sheet_name].key_dict[key_value])
                 source[sheet_name].used_key[key_value] = True
+            elif source[sheet_name].partial:
+                continue                # not updated since the last run
             else:
                 if key_value:
                     message = key + ': ' + key_value + NOT_AVAILABLE + sheet_name
@@ -193,18 +300,16 @@ def transform_data(source, target, args):
                 else:
                     log.warning(message)
                 target.remove_rows[sheet_name].append(row)
-                continue
-            update_target_row_data(source[sheet_name], key_index, target.data[sheet_name], \
-                    target.unique_columns[sheet_name], row)
+        # Update target sheet data
+        update_target_rows(source[sheet_name], target.data[sheet_name], target_rows, source_rows)
         # Identify missing keys in the target sheet which data are available from the source
         missing_target_keys = source[sheet_name].check_missing_keys(sheet_name, key, \
                 target.sheets_config[sheet_name], args.add)
         if args.add and not args.noupdate:
             formula = get_formula(source, target, sheet_name)
-            for key_value in missing_target_keys:
-                update_target_row_data(source[sheet_name], source[sheet_name].key_dict[key_value], \
-                        target.data[sheet_name], target.unique_columns[sheet_name], \
-                        len(target.data[sheet_name]), formula)
+            target.data[sheet_name] = append_target_rows(source[sheet_name], \
+                    target.data[sheet_name], [source[sheet_name].key_dict[key_value] \
+                    for key_value in missing_target_keys], formula)
         missing_all_target_key_values = missing_all_target_key_values + missing_target_keys
 
     if missing_all_target_key_values:
@@ -214,17 +319,21 @@ def main():
     """
     Get the config file, read source data and write them into the target spreadsheet.
     """
+    from synct.state import State
     signal.signal(signal.SIGINT, handle_sigint)
     log.debug(SCRIPT_STARTED)
     args = get_cli_parameters()
     if args.noupdate:
         log.info(NO_UPDATE_MODE)
     config = Config(args)
+    state = State(args.config, config.full_sync_interval) if args.incremental else None
     module = importlib.import_module(config.module)
     target = getattr(module, config.target)
     target_spreadsheet = target(config)
-    data = get_data(config, target_spreadsheet)
+    data = get_data(config, target_spreadsheet, state)
     transform_data(data, target_spreadsheet, args)
     if not args.noupdate:
         target_spreadsheet.update_data(args.remove)
+        if state:
+            state.save()
     log.debug(SCRIPT_FINISHED)
@@ -26,6 +26,7 @@ import pandas as pd
 class Tsheet:
     """ Google spreadsheet class """
     data = {}
+    original_data = {}
     rows = {}
     remove_rows = {}
     unique_columns = {}
@@ -41,18 +42,23 @@ class Tsheet:
     def get_spreadsheet(self):
         """ Read the active sheets of the target spreadsheet """
         remove_sheets = []
+        self.read_sheets()
         for sheet in self.active_sheets:
             self.get_sheet_data(sheet)
             if self.data[sheet] is None:    # empty table without header
                 remove_sheets.append(sheet) # sign for removing from active sheets
             else:
                 self.remove_rows[sheet] = []
+                self.original_data[sheet] = self.data[sheet].copy()
                 self.rows[sheet] = len(self.data[sheet].index)
                 self.unique_columns[sheet] = list(dict.fromkeys( \
                     self.data[sheet].columns.values.tolist()))
         for sheet in remove_sheets:         # remove signed empty sheets from the next operations
             self.active_sheets.remove(sheet)
 
+    def read_sheets(self):
+        """ Read data of all active sheets at once if the target supports it """
+
     def get_sheet_data(self, sheet):
         """ Read sheet data from the target spreadsheet """
 
@@ -78,80 +84,115 @@ class Tsheet:
                     self.update_column_with_links(sheet_name, column, \
                             self.sheets_config[sheet_name].columns[column].link)
             if enable_remove and self.remove_rows[sheet_name]:
-                removals = {}
-                start_row = None
-                previous_row = None
-                for current_row in sorted(self.remove_rows[sheet_name]):
-                    if start_row is None or current_row != previous_row + 1:
-                        start_row = current_row
-                        previous_row = current_row
-                        removals[start_row] = 1
-                    else:
-                        previous_row = current_row
-                        removals[start_row] = removals[start_row] + 1
-                for row in sorted(removals, reverse=True):
-                    self.delete_rows(sheet_name, \
-                            row+self.sheets_config[sheet_name].header_offset+1, removals[row])
+                self.delete_sheet_rows(sheet_name, self.remove_rows[sheet_name])
         self.save()
 
+    def delete_sheet_rows(self, sheet_name, rows):
+        """ Delete the data rows (positions) by the blocks of contiguous rows """
+        removals = {}
+        start_row = None
+        previous_row = None
+        for current_row in sorted(rows):
+            if start_row is None or current_row != previous_row + 1:
+                start_row = current_row
+                previous_row = current_row
+                removals[start_row] = 1
+            else:
+                previous_row = current_row
+                removals[start_row] = removals[start_row] + 1
+        for row in sorted(removals, reverse=True):
+            self.delete_rows(sheet_name, \
+                    row+self.sheets_config[sheet_name].header_offset+1, removals[row])
+
     def save(self):
         """ Save the target spreadsheet """
 
+def changed_cells(data, original):
+    """
+    Return the boolean mask of the data cells changed against the original
+    data. The cells of added rows are changed.
+    """
+    current = data.to_numpy(dtype=object)
+    mask = numpy.ones(current.shape, dtype=bool)
+    if original.shape[1] == current.shape[1]:
+        rows = min(len(original.index), current.shape[0])
+        before = original.to_numpy(dtype=object)[:rows]
+        now = current[:rows]
+        same = (now == before) | (pd.isnull(now) & pd.isnull(before))
+        mask[:rows] = ~same.astype(bool)
+    return mask
+
 def normalize_type(value):
     """ Avoid numpy type int64 issue that is not allowed in JSON """
     if numpy.issubdtype(type(value), int):
         value = int(value)
     return value
 
-def retrieve_formula(formula, column, value, index, element):
-    """ If formula is required then retrieve it """
-    value = element
-    if value == '' and formula and column in formula:
-        value = formula[column].iloc[(index)]
-    return value
-
-def update_target_cell_1(s_sheet, s_key_index, \
-        t_sheet, column, t_row, formula):                   # pylint: disable=too-many-arguments
-    """ Update the target cell with source data """
-    if isinstance(s_sheet.data.loc[s_key_index, (column)], pd.core.series.Series):
-        values = [''] * len(t_sheet.loc[t_row, (column)])
-        for index, element in enumerate(s_sheet.data.loc[s_key_index, (column)]):
-            values[index] = retrieve_formula( \
-                    formula, column, values[index], index, normalize_type(element))
-        t_sheet.loc[t_row, (column)] = values
-    else:
-        value = normalize_type(s_sheet.data.loc[s_key_index, (column)])
-        if value == '' and formula and column in formula:
-            value = formula[column]
-        if isinstance(value, str):                          # avoid dtype incompatibility
-            t_sheet[column] = t_sheet[column].astype('str_')
-        t_sheet.loc[t_row, (column)] = value
-
-def update_target_cell_2(t_sheet, column, t_row, formula):
-    """ Update the target cell with data """
-    if isinstance(t_sheet.loc[t_row, (column)], pd.core.series.Series):
-        values = [''] * len(t_sheet.loc[t_row, (column)])
-        for index, element in enumerate(t_sheet.loc[t_row, (column)].fillna(value='')):
-            values[index] = retrieve_formula( \
-                    formula, column, values[index], index, normalize_type(element))
-        t_sheet.loc[t_row, (column)] = values
-    else:
-        if formula and column in formula:
-            value = formula[column]
+def source_values(s_sheet, column, s_rows, occurrence):
+    """
+    Get the source column values in the order of the source rows.
+    Values of duplicated columns are taken from the column occurrence.
+    """
+    values = numpy.empty(len(s_rows), dtype=object)
+    for index, value in enumerate(s_sheet.data[column].to_numpy(dtype=object)[s_rows]):
+        if isinstance(value, pd.core.series.Series):
+            value = value.iloc[occurrence]
+        values[index] = normalize_type(value)
+    return values
+
+def column_occurrences(t_sheet):
+    """ Enumerate the target columns with the occurrence of their names """
+    occurrences = {}
+    for position, column in enumerate(t_sheet.columns):
+        occurrence = occurrences.get(column, 0)
+        occurrences[column] = occurrence + 1
+        yield position, column, occurrence
+
+def inherited_formula(formula, column, occurrence):
+    """ Get the formula inherited by the column occurrence or None """
+    if not formula or column not in formula:
+        return None
+    if isinstance(formula[column], pd.core.series.Series):
+        return formula[column].iloc[occurrence]
+    return formula[column]
+
+def update_target_rows(s_sheet, t_sheet, t_rows, s_rows):
+    """
+    Update the target rows (positions) with the source rows (indexes)
+    of the same keys column by column.
+    """
+    if not t_rows:
+        return
+    t_rows = numpy.asarray(t_rows)
+    s_rows = numpy.asarray(s_rows)
+    for position, column, occurrence in column_occurrences(t_sheet):
+        values = t_sheet.iloc[:, position].to_numpy(dtype=object, copy=True)
+        if column in s_sheet.data.columns:
+            values[t_rows] = source_values(s_sheet, column, s_rows, occurrence)
         else:
-            value = ''
-        try:
-            if pd.isnull(t_sheet.loc[t_row, (column)]):
-                t_sheet.loc[t_row, (column)] = normalize_type(value)
-        # Fix undefined variable or value issue
-        except (KeyError, ValueError):
-            t_sheet.loc[t_row, (column)] = normalize_type(value)
-
-def update_target_row_data(s_sheet, s_key_index, \
-        t_sheet, t_unique_columns, t_row, formula=None):    # pylint: disable=too-many-arguments
-    """ Update the target row with source data """
-    for column in t_unique_columns:
+            empty = t_rows[pd.isnull(values[t_rows]).astype(bool)]
+            values[empty] = ''
+        t_sheet.isetitem(position, values)
+
+def append_target_rows(s_sheet, t_sheet, s_rows, formula=None):
+    """
+    Return the target sheet extended by the source rows (indexes).
+    Empty cells of the added rows inherit the formula if it is required.
+    """
+    if not s_rows:
+        return t_sheet
+    s_rows = numpy.asarray(s_rows)
+    data = {}
+    for position, column, occurrence in column_occurrences(t_sheet):
+        inherited = inherited_formula(formula, column, occurrence)
         if column in s_sheet.data.columns:
-            update_target_cell_1(s_sheet, s_key_index, t_sheet, column, t_row, formula)
+            values = list(source_values(s_sheet, column, s_rows, occurrence))
+            if inherited is not None:
+                values = [inherited if value == '' else value for value in values]
         else:
-            update_target_cell_2(t_sheet, column, t_row, formula)
+            values = [inherited if inherited is not None else ''] * len(s_rows)
+        data[position] = values
+    length = len(t_sheet.index)
+    new_rows = pd.DataFrame(data, index=range(length, length+len(s_rows)), dtype=object)
+    new_rows.columns = t_sheet.columns
+    return pd.concat([t_sheet, new_rows])
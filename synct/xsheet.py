@@ -20,19 +20,27 @@ synct reads data and copies in Google or Excel spreadsheet.
 synct.xsheet: Input spreadsheet operations
 """
 
+import csv
 import pathlib
+import re
 import warnings
 
+from itertools import islice
 from json import loads
 
 import pandas as pd
 
 import synct.logger as log
 
+from synct.source import source_fields
+
 # Debug messages:
 IDENTIFY_INPUT_FILE_TYPE = 'identify input file type'
 READ_INPUT_FILE = 'read data from the input file: '
 INPUT_DATA_QUERY = 'input data query: '
+INPUT_COLUMNS = 'input file columns: '
+CSV_DELIMITER = 'CSV delimiter: '
+CSV_DELIMITER_NOT_DETECTED = 'CSV delimiter not detected, comma is used'
 
 # Error messages:
 UNKNOWN_INPUT_FILE_TYPE = 'unknown input file type'
@@ -45,24 +53,29 @@ WRONG_OFFSET_INPUT_FILE = 'it could be a wrong offset of the header in the input
 IGNORED_TABLE = 'table selection is ignored, not supported in CSV files'
 
 # Input spreadsheet engines per file name extension
-input_engines = {'.csv': 'python', '.ods': 'odf', '.xls': 'xlrd', '.xlsx': 'openpyxl'}
+input_engines = {'.csv': 'c', '.ods': 'odf', '.xls': 'xlrd', '.xlsx': 'openpyxl'}
+
+SNIFF_LINES = 20    # CSV lines used to detect the delimiter
+
+# Column names in the queries, plain or quoted by backticks
+QUERY_NAMES = re.compile(r'`([^`]*)`|([^\W\d]\w*)')
 
 class Xsheet:
     """ Input spreadsheet file class """
+    max_queries = 1     # maximum number of concurrent sheet queries
 
     def __init__(self, args, name, table, offset):
         """
-        Idetify data format of the the local file
-        and read data that will be selected later on.
+        Idetify data format of the the local file. The data are read
+        by prepare() once the sheets and their queries are known.
         """
         self.get_input(args, name)
-        self.read_input_file(args, table, offset)
-        for column in self.data:
-            if  self.data[column].dtypes == 'datetime64[ns]':     # convert date to string
-                self.data[column] = pd.to_datetime(self.data[column]).astype(str)
+        self.table_name = table if args.table is None else args.table
+        self.offset = offset if args.offset is None else args.offset
+        self.data = None
 
-    def data_query(self, sheet, sheet_query):
-        """ Query to input file """
+    def data_pages(self, sheet, sheet_query, fields=None):  # pylint: disable=unused-argument
+        """ Query to input file, the whole response is one page """
         log.debug(INPUT_DATA_QUERY + str(sheet_query))
         try:
             data = loads(self.data.query(sheet_query).to_json(orient='records'))
@@ -73,7 +86,18 @@ class Xsheet:
             log.error(QUERY_FAILED + sheet + ':\n' + sheet_query)
             log.error(WRONG_OFFSET_INPUT_FILE)
             log.fatal_error(exception)
-        return data
+        yield data
+
+    def incremental_query(self, sheet_query, since):     # pylint: disable=unused-argument
+        """ Input files do not provide update times, the full query is used """
+        return None
+
+    def prepare(self, sheets, queries):
+        """ Read the input file before the queries """
+        self.read_input_file(sheets, queries)
+
+    def report(self):
+        """ Input files have no source statistics to report """
 
     def get_input(self, args, name):
         """ Indetify input file type """
@@ -87,28 +111,64 @@ class Xsheet:
         except TypeError:
             log.fatal_error(MISSING_OR_INCORRECT_INPUT_FILE)
 
-    def read_input_file(self, args, table, offset):
-        """ Read input file """
+    def read_input_file(self, sheets, queries):
+        """
+        Read input file. Only the columns used by the sheets and their queries
+        are read unless a sheet takes the default columns.
+        """
         log.debug(READ_INPUT_FILE + self.file_name)
-        table_name = table if args.table is None else args.table
-        offset_value = offset if args.offset is None else args.offset
+        columns = used_columns(sheets, queries)
+        log.debug(INPUT_COLUMNS + ('all' if columns is None else str(sorted(columns))))
+        usecols = None if columns is None else lambda column: str(column) in columns
         try:
             # suppress warnig: Workbook contains no default style, apply openpyxl's default
             with warnings.catch_warnings(record=True):
                 warnings.simplefilter('always')
                 if pathlib.Path(self.file_name).suffix == '.csv':
-                    if table_name:
+                    if self.table_name:
                         log.warning(IGNORED_TABLE)
                     self.data = pd.read_csv(self.file_name, engine=self.engine,
-                                            sep=None,   # python engine can detect the separator
-                                            skiprows=offset_value, keep_default_na=False)
-                elif table_name:
+                                            sep=self.csv_delimiter(), usecols=usecols,
+                                            skiprows=self.offset, keep_default_na=False)
+                elif self.table_name:
                     self.data = pd.read_excel(self.file_name, engine=self.engine,
-                                              sheet_name=table_name, skiprows=offset_value,
-                                              keep_default_na=False)
+                                              sheet_name=self.table_name, usecols=usecols,
+                                              skiprows=self.offset, keep_default_na=False)
                 else:
                     self.data = pd.read_excel(self.file_name, engine=self.engine,
-                                              skiprows=offset_value, keep_default_na=False)
+                                              usecols=usecols, skiprows=self.offset,
+                                              keep_default_na=False)
         except (OSError, ValueError) as exception:
             log.error(exception)
             log.fatal_error(READING_INPUT_FILE_FAILED)
+        for column in self.data:
+            if  self.data[column].dtypes == 'datetime64[ns]':     # convert date to string
+                self.data[column] = pd.to_datetime(self.data[column]).astype(str)
+
+    def csv_delimiter(self):
+        """ Detect the CSV delimiter from the first lines below the offset """
+        with open(self.file_name, encoding='utf-8', errors='replace') as csv_file:
+            sample = ''.join(islice(csv_file, self.offset, self.offset + SNIFF_LINES))
+        try:
+            delimiter = csv.Sniffer().sniff(sample).delimiter
+        except csv.Error:
+            log.debug(CSV_DELIMITER_NOT_DETECTED)
+            return ','
+        log.debug(CSV_DELIMITER + repr(delimiter))
+        return delimiter
+
+def used_columns(sheets, queries):
+    """
+    Get the input file columns used by the sheet columns and the queries.
+    None is returned if a sheet takes the default columns.
+    """
+    columns = set()
+    for sheet_name, sheet_config in sheets.items():
+        fields = source_fields(sheet_config)
+        if fields is None:
+            return None
+        for field in fields:
+            columns.update((field, field.split('.')[0]))
+        for quoted, name in QUERY_NAMES.findall(str(queries[sheet_name])):
+            columns.add(quoted or name)
+    return columns
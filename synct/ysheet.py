@@ -20,29 +20,38 @@ synct reads data and copies in Google or Excel spreadsheet.
 synct.ysheet: Local target spreadsheet operations
 """
 
+import os
 import pathlib
+import shutil
+import tempfile
 
-from copy import deepcopy
+from bisect import bisect_left
 
 import pandas as pd
 import numpy as np
 from openpyxl import load_workbook
 
 import synct.logger as log
-from synct.tsheet import Tsheet
+from synct.tsheet import Tsheet, changed_cells
 
 # Debug messages:
 ACCESS_LOCAL_SPREADSHEET = 'access local target spreadsheet'
+SAVE_LOCAL_SPREADSHEET = 'save local target spreadsheet'
+LOAD_LOCAL_WORKBOOK = 'load local target workbook with formatting'
 ADD_ROWS_LOCAL_SHEET = 'add rows in local target sheet: '
+DELETE_ROWS_LOCAL_SHEET = 'delete rows in local target sheet: '
 GOT_LOCAL_SPREADSHEET_ACCESS = 'got local target spreadsheet access'
 LINK_UPDATE = 'link update: '
 READ_LOCAL_SHEET = 'read local target sheet: '
 UPDATE_LOCAL_SHEET = 'update local target sheet: '
+CHANGED_CELLS = ' changed cells: '
+NO_CHANGES = 'no changes in the local target spreadsheet, the file is not updated'
 
 # Error messages:
 UNKNOWN_TARGET_FILE_TYPE = 'unknown target local spreadsheet file type'
 MISSING_OR_INCORRECT_TARGET_FILE = 'missing or incorrect target local spreadsheet file'
 READING_TARGET_FILE_FAILED = 'reading target local spreadsheet file failed'
+SAVING_TARGET_FILE_FAILED = 'saving target local spreadsheet file failed'
 
 WRONG_HEADER = 'wrong header in the sheet '
 #WRONG_HEADER_OFFSET = 'header offset could be wrong in the sheet '
@@ -52,13 +61,22 @@ engines = {'.xlsx': 'openpyxl', '.xlsm': 'openpyxl', '.xltx': 'openpyxl', '.xltm
 
 class Ysheet(Tsheet):
     """ Target local spreadsheet class """
-    sheet_length = {}   # It is needed for the delete_rows workaround.
+    sheet_length = {}   # number of data rows in the workbook sheet
 
     def __init__(self, config):
-        """ Acccess the spreadsheet and read data """
+        """
+        Acccess the spreadsheet and read data. Only the values of the active
+        sheets are parsed, the complete workbook with the formatting is loaded
+        when it is updated.
+        """
         self.spreadsheet = config.spreadsheet
+        self.workbook = None
+        self.changed = {}       # masks of the changed cells per sheet
         self.access_spreadsheet()
-        Tsheet.__init__(self, config)
+        try:
+            Tsheet.__init__(self, config)
+        finally:
+            self.values_workbook.close()
 
     def access_spreadsheet(self):
         """ Access local target spreadsheet """
@@ -70,8 +88,22 @@ class Ysheet(Tsheet):
             log.fatal_error(UNKNOWN_TARGET_FILE_TYPE)
         except TypeError:
             log.fatal_error(MISSING_OR_INCORRECT_TARGET_FILE)
-        # Read the original Excel workbook into an openpyxl workbook object
-        # It is needed to preserve the original formatting
+        # The read-only workbook parses the worksheets on demand
+        try:
+            self.values_workbook = load_workbook(self.spreadsheet, read_only=True, \
+                    data_only=False)
+        except (OSError, ValueError) as exception:
+            log.error(exception)
+            log.fatal_error(READING_TARGET_FILE_FAILED)
+
+    def open_workbook(self):
+        """
+        Read the original Excel workbook into an openpyxl workbook object.
+        It is needed to preserve the original formatting.
+        """
+        if self.workbook is not None:
+            return
+        log.debug(LOAD_LOCAL_WORKBOOK)
         try:
             self.workbook = load_workbook(self.spreadsheet, data_only=False)
         except (OSError, ValueError) as exception:
@@ -82,7 +114,7 @@ class Ysheet(Tsheet):
         """ Read sheet data to pandas data frame """
         log.debug(READ_LOCAL_SHEET + "'" + sheet + "'")
         # Get data sheet
-        self.data[sheet] = pd.DataFrame(self.workbook[sheet].values)
+        self.data[sheet] = pd.DataFrame(self.values_workbook[sheet].values, dtype=object)
         # Get header
         header_list = self.data[sheet].iloc[ \
                 self.sheets_config[sheet].header_offset].values.flatten().tolist()
@@ -105,50 +137,57 @@ class Ysheet(Tsheet):
         self.data[sheet].rename(columns=dict(zip(self.data[sheet].columns, header_list,)), \
                 inplace=True)
 
-        # It is needed for the delete_rows workaround:
+        # Number of data rows in the workbook sheet:
         self.sheet_length[sheet] = len(self.data[sheet])
 
     def insert_rows(self, sheet, _, inserted_rows):
         """ Insert empty rows in the spreadsheet """
         log.debug(ADD_ROWS_LOCAL_SHEET + "'" + sheet + "'")
 
-        # It is needed for the delete_rows workaround:
+        # Number of data rows in the workbook sheet:
         self.sheet_length[sheet] = self.sheet_length[sheet] + inserted_rows
 
-    def delete_rows(self, sheet, start_row, deleted_rows):
-        """ Delete rows in the workbook """
-
-        # Bug: delete_rows function leaves hyperlink data in the cell
-        # https://foss.heptapod.net/openpyxl/openpyxl/-/issues/1318
-        # This code solve the issue with the workaround
-
-        # Workaround step 1:
-        # Save copied hyperlinks on rows under the block of rows that will be deleted
-
-        start = start_row + deleted_rows + 1
-        num_rows = self.sheets_config[sheet].header_offset + self.sheet_length[sheet] - start + 1
-        restore_hyperlink = {}
-
-        for row in range(start, start + num_rows + 1):
-            restore_hyperlink[row] = {}
-            for cell in self.workbook[sheet][row]:
-                if cell.hyperlink:
-                    restore_hyperlink[row][cell.column] = deepcopy(cell.hyperlink)
-
-        # Delete the rows
-        self.workbook[sheet].delete_rows(start_row+1, deleted_rows)
-
-        # Workaround step 2:
-        # Restore hyperlinks
-        start = start_row + 1
-
-        for row in range(start, start + num_rows + 1):
-            for cell in self.workbook[sheet][row]:
-                if cell.column in restore_hyperlink[row+deleted_rows]:
-                    cell.hyperlink = restore_hyperlink[row+deleted_rows][cell.column]
-        self.sheet_length[sheet] = self.sheet_length[sheet] - deleted_rows
-
-        self.save()
+    def update_data(self, enable_remove):
+        """
+        Load the complete workbook and update it. The file is left untouched
+        if no cell is changed, no row is removed and no links are updated.
+        """
+        self.changed = {sheet: changed_cells(self.data[sheet], self.original_data[sheet]) \
+                for sheet in self.active_sheets}
+        changed = any(self.changed[sheet].any() or enable_remove and self.remove_rows[sheet] \
+                or any(column.link and column_name == self.sheets_config[sheet].key \
+                for column_name, column in self.sheets_config[sheet].columns.items()) \
+                for sheet in self.active_sheets)
+        if not changed:
+            log.debug(NO_CHANGES)
+            return
+        self.open_workbook()
+        Tsheet.update_data(self, enable_remove)
+
+    def delete_sheet_rows(self, sheet_name, rows):
+        """
+        Delete the data rows (positions) in one sweep. The cells below the
+        deleted rows are moved up with their values, styles and hyperlinks.
+        The hyperlinks are assigned again to update their cell references,
+        openpyxl delete_rows leaves them on the original cells:
+        https://foss.heptapod.net/openpyxl/openpyxl/-/issues/1318
+        """
+        worksheet = self.workbook[sheet_name]
+        first_row = self.sheets_config[sheet_name].header_offset + 2
+        removed = sorted({row + first_row for row in rows})
+        cells = worksheet._cells                        # pylint: disable=protected-access
+        moved = [cells.pop(coordinate) for coordinate in \
+                [coordinate for coordinate in cells if coordinate[0] >= removed[0]]]
+        for cell in moved:
+            shift = bisect_left(removed, cell.row)
+            if shift < len(removed) and removed[shift] == cell.row:
+                continue                                # the cell is deleted
+            cell.row = cell.row - shift
+            cells[(cell.row, cell.column)] = cell
+            if cell.hyperlink:
+                cell.hyperlink = cell.hyperlink
+        log.debug(DELETE_ROWS_LOCAL_SHEET + "'" + sheet_name + "': " + str(len(removed)))
+        self.sheet_length[sheet_name] = self.sheet_length[sheet_name] - len(removed)
 
     def update_spreadsheet(self):
         """ Update the target spreadsheet data without header """
@@ -157,12 +196,13 @@ class Ysheet(Tsheet):
                 self.insert_rows(t_sheet, \
                         self.sheets_config[t_sheet].header_offset+self.rows[t_sheet]+2, \
                         len(self.data[t_sheet])-self.rows[t_sheet])
-            log.debug(UPDATE_LOCAL_SHEET + "'" + t_sheet + "'")
-            for index, row in self.data[t_sheet].iterrows():
-                for col_index, value in enumerate(row, start=1):
-                    cell = self.workbook[t_sheet].cell( \
-                            row=index+self.sheets_config[t_sheet].header_offset+2, column=col_index)
-                    cell.value = value
+            rows, columns = np.nonzero(self.changed[t_sheet])
+            log.debug(UPDATE_LOCAL_SHEET + "'" + t_sheet + "'" + CHANGED_CELLS + str(len(rows)))
+            values = self.data[t_sheet].to_numpy(dtype=object)
+            worksheet = self.workbook[t_sheet]
+            first_row = self.sheets_config[t_sheet].header_offset + 2
+            for row, column in zip(rows.tolist(), columns.tolist()):
+                worksheet.cell(row=row+first_row, column=column+1).value = values[row, column]
 
     def update_column_with_links(self, sheet, column, link):
         """ Update the column in the target sheet with links """
@@ -172,8 +212,25 @@ class Ysheet(Tsheet):
             cell = self.workbook[sheet].cell( \
                     row=index+self.sheets_config[sheet].header_offset+2, column=col)
             cell.hyperlink = link + str(cell.value)
-        self.save()
 
     def save(self):
-        """ Save the target spreadsheet """
-        self.workbook.save(self.spreadsheet)
+        """
+        Save all the workbook changes at once. The workbook is written to
+        a temporary file that replaces the spreadsheet file, so the file is
+        never left half-written.
+        """
+        log.debug(SAVE_LOCAL_SPREADSHEET)
+        path = os.path.realpath(self.spreadsheet)
+        temp_name = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), \
+                    suffix=pathlib.Path(path).suffix, delete=False) as temp_file:
+                temp_name = temp_file.name
+                self.workbook.save(temp_file)
+            shutil.copymode(path, temp_name)
+            os.replace(temp_name, path)
+        except OSError as exception:
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
+            log.error(exception)
+            log.fatal_error(SAVING_TARGET_FILE_FAILED)
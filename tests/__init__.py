@@ -0,0 +1,12 @@
+"""
+Helpers shared by the tests.
+"""
+
+import shutil
+import tempfile
+
+def temporary_directory(test_case):
+    """ Create a temporary directory removed after the test """
+    directory = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    return directory
@@ -0,0 +1,81 @@
+"""
+Testing the source response cache stored in a local directory
+and the source responses cached page by page.
+"""
+
+import os
+import time
+import unittest
+
+from types import SimpleNamespace
+
+from synct.cache import Cache, CachedSource
+from tests import temporary_directory
+
+KEY = ['Jira', 'https://jira.example.com', 'project = TEST', None]
+RECORDS = [{'key': 'TEST-1'}, {'key': 'TEST-2'}]
+
+class TestCache(unittest.TestCase):
+    """ Test the expiration and the eviction of the cached responses """
+
+    def setUp(self):
+        """ Use a temporary cache directory """
+        self.directory = temporary_directory(self)
+
+    def test_cached_response(self):
+        """ Stored records are returned until they expire """
+        cache = Cache(self.directory, 3600, 1000000)
+        self.assertIsNone(cache.get(KEY))
+        cache.put(KEY, RECORDS)
+        self.assertEqual(cache.get(KEY), RECORDS)
+        self.assertIsNone(cache.get(KEY[:2] + ['project = OTHER', None]))
+
+    def test_expired_response(self):
+        """ Expired records are used only when the TTL is ignored """
+        cache = Cache(self.directory, 3600, 1000000)
+        cache.put(KEY, RECORDS)
+        expired = time.time() - 7200
+        os.utime(cache.path(KEY), (expired, expired))
+        self.assertIsNone(cache.get(KEY))
+        self.assertEqual(cache.get(KEY, ignore_ttl=True), RECORDS)
+        cache.put(KEY[:2] + ['project = OTHER', None], RECORDS)
+        self.assertEqual(cache.get(KEY, ignore_ttl=True), RECORDS)
+
+    def test_size_eviction(self):
+        """ The oldest files are evicted above the size limit """
+        cache = Cache(self.directory, 3600, 1)
+        cache.put(KEY, RECORDS)
+        self.assertIsNone(cache.get(KEY))
+
+    def test_failed_put(self):
+        """ The temporary file is removed if the records cannot be stored """
+        cache = Cache(self.directory, 3600, 1000000)
+        records = []
+        records.append(records)
+        cache.put(KEY, records)
+        self.assertEqual(os.listdir(self.directory), [])
+
+class TestCachedSource(unittest.TestCase):
+    """ Test the source pages written to the cache """
+
+    def setUp(self):
+        """ Use a temporary cache directory and a source of two pages """
+        self.directory = temporary_directory(self)
+        self.cache = Cache(self.directory, 3600, 1000000)
+        self.source = SimpleNamespace(url=KEY[1], to_raw=dict, from_raw=dict, \
+                data_pages=lambda *_: iter([RECORDS[:1], RECORDS[1:]]))
+
+    def test_cached_pages(self):
+        """ The response is stored after the last page """
+        pages = CachedSource(self.source, self.cache, False).data_pages('TEST', KEY[2])
+        self.assertEqual(next(pages), RECORDS[:1])
+        self.assertEqual(list(pages), [RECORDS[1:]])
+        pages = CachedSource(self.source, self.cache, True).data_pages('TEST', KEY[2])
+        self.assertEqual([record for page in pages for record in page], RECORDS)
+
+    def test_interrupted_pages(self):
+        """ The response is not stored if the pages are not completed """
+        pages = CachedSource(self.source, self.cache, False).data_pages('TEST', KEY[2])
+        next(pages)
+        pages.close()
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,105 @@
+"""
+Testing the GitHub pages revalidated by ETag
+and the requests paced by the rate limit.
+"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from synct.cache import Cache
+from synct.git import Github, RateLimit
+from tests import temporary_directory
+
+URL = 'https://api.github.com/search/issues'
+QUERY = '?q=repo:test/test'
+ITEMS = {'items': [{'number': 1}]}
+LINK = {'Link': '<https://api.github.com/search/issues?page=1>; rel="first"'}
+
+def response(status_code, headers, page=None):
+    """ Build a fake response """
+    resp = MagicMock(status_code=status_code, ok=status_code < 400, headers=headers)
+    resp.json.return_value = page
+    return resp
+
+def data_query(github):
+    """ Get all the items of the query response pages """
+    return [item for page in github.data_pages('TEST', QUERY) for item in page]
+
+class TestGithubEtag(unittest.TestCase):
+    """ Test the conditional requests of the GitHub pages """
+
+    def setUp(self):
+        """ Use a temporary cache directory """
+        self.directory = temporary_directory(self)
+
+    def test_not_modified(self):
+        """ The unchanged page is taken from the cache """
+        github = Github(URL, None)
+        github.etag_cache = Cache(self.directory, 3600, 1000000)
+        github.session = MagicMock()
+        github.session.get.side_effect = [
+            response(200, dict(LINK, ETag='"abc"'), ITEMS),
+            response(requests.codes.not_modified, {})
+        ]
+        self.assertEqual(data_query(github), ITEMS['items'])
+        self.assertEqual(data_query(github), ITEMS['items'])
+        self.assertIsNone(github.session.get.call_args_list[0].kwargs['headers'])
+        self.assertEqual(github.session.get.call_args_list[1].kwargs['headers'],
+                         {'If-None-Match': '"abc"'})
+
+class TestRateLimit(unittest.TestCase):
+    """ Test the pacing of the requests by the rate limit headers """
+
+    @patch('synct.git.sleep')
+    @patch('synct.git.time', return_value=1000)
+    def test_rate_limit(self, _, mock_sleep):
+        """ Requests are spread when running low and paused when exhausted """
+        rate_limit = RateLimit()
+        mock_sleep.side_effect = lambda _: self.assertFalse(rate_limit.lock.locked())
+        rate_limit.acquire()
+        rate_limit.update({'X-RateLimit-Limit': '30', 'X-RateLimit-Remaining': '10',
+                           'X-RateLimit-Reset': '1059'})
+        rate_limit.acquire()
+        mock_sleep.assert_not_called()
+        rate_limit.update({'RateLimit-Limit': '30', 'RateLimit-Remaining': '2',
+                           'RateLimit-Reset': '1059'})
+        rate_limit.acquire()
+        mock_sleep.assert_called_once_with(30)
+        rate_limit.update({'X-RateLimit-Limit': '30', 'X-RateLimit-Remaining': '0',
+                           'X-RateLimit-Reset': '1059'})
+        self.assertEqual(rate_limit.acquire(), 60)
+        self.assertEqual(rate_limit.paused, 90)
+
+    @patch('synct.git.sleep')
+    def test_rate_limited_request(self, mock_sleep):
+        """ The rate limited request is repeated after the required delay """
+        github = Github(URL, None)
+        github.session = MagicMock()
+        github.session.get.side_effect = [
+            response(403, {'Retry-After': '5'}),
+            response(200, LINK, ITEMS)
+        ]
+        self.assertEqual(data_query(github), ITEMS['items'])
+        mock_sleep.assert_called_once_with(5)
+        self.assertEqual(github.rate_limit.paused, 5)
+
+class TestGithubPartition(unittest.TestCase):
+    """ Test the search queries split into time windows """
+
+    def test_partition(self):
+        """ Windows over the results limit are halved, items are de-duplicated """
+        pages = [response(200, {}, {'total_count': 1500, 'items': []})]
+        def search(request, **_):
+            """ The whole time range exceeds the limit, its halves do not """
+            if pages:
+                return pages.pop()
+            if 'created:2008-01-01T00:00:00Z..' in request:
+                return response(200, {}, {'total_count': 700, 'items': [{'id': 1}, {'id': 2}]})
+            return response(200, {}, {'total_count': 800, 'items': [{'id': 2}, {'id': 3}]})
+        github = Github(URL, None, 'created', 2)
+        github.session = MagicMock()
+        github.session.get.side_effect = search
+        self.assertEqual([item['id'] for item in data_query(github)], [1, 2, 3])
+        self.assertEqual(github.session.get.call_count, 3)
@@ -0,0 +1,58 @@
+"""
+Testing the Google spreadsheet update that sends
+only the changed blocks of cells.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from synct.gsheet import Quota, changed_blocks, column_letters, sheet_range
+from synct.tsheet import changed_cells
+
+class TestChangedCells(unittest.TestCase):
+    """ Test the identification of the changed cells """
+
+    def test_changed_cells(self):
+        """ Changed and added cells are identified, empty cells are equal """
+        original = pd.DataFrame([['a', 1, None], ['b', 2, '']])
+        data = pd.DataFrame([['a', 1, None], ['c', 2, ''], ['d', 3, '']])
+        expected = np.array([[False, False, False], [True, False, False], [True, True, True]])
+        np.testing.assert_array_equal(changed_cells(data, original), expected)
+
+    def test_changed_blocks(self):
+        """ Changed cells are merged into rectangular blocks """
+        mask = np.array([
+            [False, True, True, False],
+            [False, True, True, False],
+            [False, False, False, False],
+            [True, False, False, True],
+            [True, True, True, True]
+        ])
+        self.assertEqual(changed_blocks(mask),
+                         [(0, 1, 1, 2), (3, 3, 0, 0), (3, 3, 3, 3), (4, 4, 0, 3)])
+
+    def test_sheet_range(self):
+        """ Blocks are converted to the A1 notation """
+        self.assertEqual(column_letters(0), 'A')
+        self.assertEqual(column_letters(25), 'Z')
+        self.assertEqual(column_letters(26), 'AA')
+        self.assertEqual(column_letters(701), 'ZZ')
+        self.assertEqual(sheet_range("Bob's", 2, 1, 5, 27), "'Bob''s'!B2:AB5")
+
+class TestQuota(unittest.TestCase):
+    """ Test the pacing of requests within the quota """
+
+    @patch('synct.gsheet.sleep')
+    @patch('synct.gsheet.monotonic', return_value=0)
+    def test_quota(self, _, mock_sleep):
+        """ Requests over the quota wait for the refilled bucket """
+        quota = Quota(60)
+        for _ in range(60):
+            quota.acquire()
+        mock_sleep.assert_not_called()
+        quota.acquire()
+        mock_sleep.assert_called_once_with(1)
+        self.assertEqual(quota.throttled, 1)
@@ -0,0 +1,33 @@
+"""
+Testing the Jira pages requested concurrently.
+"""
+
+import unittest
+from unittest.mock import MagicMock
+
+from jira import JIRAError
+
+from synct.jira import Jira
+
+QUERY = 'project = TEST'
+
+def response(start_at, total):
+    """ Build a fake page of one issue """
+    return MagicMock(iterable=[{'key': 'TEST-' + str(start_at)}], total=total)
+
+class TestJiraPages(unittest.TestCase):
+    """ Test the pages requested by the workers """
+
+    def test_failed_page(self):
+        """ The failed page is reported once after the workers have finished """
+        jira = Jira('https://jira.example.com', None, 1, max_workers=2, offline=True)
+        jira.access = MagicMock()
+        def search_issues(startAt, **_):        # pylint: disable=invalid-name
+            """ The second page fails """
+            if startAt == 1:
+                raise JIRAError(status_code=400, text='Bad Request')
+            return response(startAt, 3)
+        jira.access.search_issues.side_effect = search_issues
+        with self.assertRaises(SystemExit):
+            list(jira.data_pages('TEST', QUERY))
+        jira.access.close.assert_called_once()
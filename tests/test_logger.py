@@ -0,0 +1,37 @@
+"""
+Testing the messages and the errors buffered by the threads.
+"""
+
+import logging
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import synct.logger as log
+
+class TestBuffered(unittest.TestCase):
+    """ Test the message buffer shared by the worker threads """
+
+    def test_worker_messages(self):
+        """ Messages of the worker threads are kept in the caller buffer """
+        with log.buffered() as records:
+            log.info('caller')
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(log.with_buffer(log.info), ['worker 1', 'worker 2']))
+        self.assertEqual(sorted(records), [(logging.INFO, 'caller'), \
+                (logging.INFO, 'worker 1'), (logging.INFO, 'worker 2')])
+
+    @patch('synct.logger.ERROR_FLAG', log.ErrorFlag())
+    def test_buffer_error(self):
+        """ An error is kept in its buffer until the messages are replayed """
+        with log.buffered() as records:
+            log.error('failed')
+            with self.assertRaises(SystemExit):
+                log.check_error()
+        with log.buffered():
+            log.check_error()
+        log.check_error()
+        log.replay(records)
+        with self.assertRaises(SystemExit):
+            log.check_error()
@@ -0,0 +1,28 @@
+"""
+Testing the worker threads stopped at the first failure.
+"""
+
+import threading
+import unittest
+
+from synct.pool import worker_pool
+
+class TestWorkerPool(unittest.TestCase):
+    """ Test the tasks cancelled when the consumer fails """
+
+    def test_cancelled_tasks(self):
+        """ The queued tasks are cancelled and the running one is not waited for """
+        started = threading.Event()
+        release = threading.Event()
+        def task():
+            """ Wait until the test is finished """
+            started.set()
+            release.wait()
+        with self.assertRaises(SystemExit):
+            with worker_pool(1) as executor:
+                futures = [executor.submit(task) for _ in range(5)]
+                started.wait()
+                raise SystemExit(130)
+        self.assertTrue(all(future.cancelled() for future in futures[1:]))
+        self.assertFalse(futures[0].done())
+        release.set()
@@ -0,0 +1,48 @@
+"""
+Testing the source data added page by page
+and the keys matching the optional patterns.
+"""
+
+import unittest
+
+from synct.config import Column, Sheet
+from synct.source import SourceData, compiled
+
+SHEET = 'TEST'
+KEY = 'Key'
+
+class TestOptional(unittest.TestCase):
+    """ Test the keys not required in the target sheet """
+
+    def test_optional_keys(self):
+        """ Keys of the rows matching an optional pattern are not missing """
+        sheet_config = Sheet(key=KEY, columns={
+            KEY: Column(data='key'),
+            'Status': Column(data='status', optional='Closed|Done'),
+            'Type': Column(data='type', optional='Epic')
+        })
+        source_data = SourceData([
+            {'key': 'A-1', 'status': 'Closed', 'type': 'Bug'},
+            {'key': 'A-2', 'status': 'New', 'type': 'Epic'},
+            {'key': 'A-3', 'status': 'New', 'type': 'Bug'},
+            {'key': 'A-4', 'type': 'Story'}
+        ], sheet_config)
+        self.assertEqual(source_data.check_missing_keys(SHEET, KEY, sheet_config, False),
+                         ['A-3', 'A-4'])
+
+    def test_compiled_patterns(self):
+        """ Patterns are compiled once """
+        self.assertIs(compiled('Closed|Done'), compiled('Closed|Done'))
+
+class TestPages(unittest.TestCase):
+    """ Test the source data added page by page """
+
+    def test_added_pages(self):
+        """ Pages are appended to the data and their column values are released """
+        sheet_config = Sheet(key=KEY, columns={KEY: Column(data='key')})
+        source_data = SourceData([{'key': 'A-1'}], sheet_config)
+        source_data.add_items([{'key': 'A-2'}, {'key': 'A-3'}])
+        source_data.update_data()
+        self.assertEqual(source_data.data[KEY].tolist(), ['A-1', 'A-2', 'A-3'])
+        self.assertEqual(source_data.data.index.tolist(), [0, 1, 2])
+        self.assertEqual(source_data.values, [[]])
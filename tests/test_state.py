@@ -0,0 +1,55 @@
+"""
+Testing the incremental sync state stored in the local file.
+"""
+
+import unittest
+
+from datetime import timedelta
+from pathlib import Path
+
+from synct.state import State, WATERMARK_OVERLAP
+from tests import temporary_directory
+
+SHEET = 'TEST'
+QUERY = ['project = TEST', None]
+
+class TestState(unittest.TestCase):
+    """ Test the watermarks and the periodic full sync """
+
+    def setUp(self):
+        """ Use a config file in a temporary directory """
+        self.directory = temporary_directory(self)
+        self.config_file = str(Path(self.directory) / 'synct.yaml')
+
+    def test_first_run(self):
+        """ The first run is the full sync """
+        state = State(self.config_file, 7)
+        self.assertIsNone(state.since(SHEET, QUERY))
+
+    def test_incremental_run(self):
+        """ The next run gets items updated since the watermark """
+        state = State(self.config_file, 7)
+        state.sync(SHEET, state.since(SHEET, QUERY), QUERY)
+        state.save()
+        self.assertTrue(Path(self.directory, 'synct.state.json').exists())
+        watermark = state.started
+        state = State(self.config_file, 7)
+        self.assertEqual(state.since(SHEET, QUERY), watermark - WATERMARK_OVERLAP)
+
+    def test_full_sync_interval(self):
+        """ The full sync is required after the interval """
+        state = State(self.config_file, 7)
+        state.sync(SHEET, None, QUERY)
+        state.save()
+        state = State(self.config_file, 7)
+        state.started = state.started + timedelta(days=8)
+        self.assertIsNone(state.since(SHEET, QUERY))
+
+    def test_changed_query(self):
+        """ The full sync is required if the query has changed """
+        state = State(self.config_file, 7)
+        state.sync(SHEET, None, QUERY)
+        state.save()
+        state = State(self.config_file, 7)
+        self.assertIsNone(state.since(SHEET, ['project = OTHER', None]))
+        self.assertIsNotNone(state.since(SHEET, QUERY))
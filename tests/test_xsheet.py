@@ -0,0 +1,45 @@
+"""
+Testing the input file that reads only the columns used by the sheets
+and detects the CSV delimiter.
+"""
+
+import unittest
+
+from pathlib import Path
+from types import SimpleNamespace
+
+from synct.config import Column, Sheet
+from synct.xsheet import Xsheet
+from tests import temporary_directory
+
+SHEET = 'TEST'
+CSV_DATA = 'Exported data\nKey;Summary;Status;Owner name\nA-1;first;New;one\nA-2;second;Done;two\n'
+QUERY = "Status == 'New' and `Owner name` != ''"
+
+class TestXsheet(unittest.TestCase):
+    """ Test reading the input file """
+
+    def setUp(self):
+        """ Create the CSV file in a temporary directory """
+        self.directory = temporary_directory(self)
+        self.file_name = str(Path(self.directory) / 'input.csv')
+        with open(self.file_name, 'w', encoding='utf-8') as csv_file:
+            csv_file.write(CSV_DATA)
+        self.args = SimpleNamespace(file=self.file_name, table=None, offset=None)
+
+    def test_used_columns(self):
+        """ Only the columns of the sheet and its query are read """
+        xsheet = Xsheet(self.args, None, None, 1)
+        sheet_config = Sheet(key='Key', columns={'Key': Column(data='Key')})
+        xsheet.prepare({SHEET: sheet_config}, {SHEET: QUERY})
+        self.assertEqual(list(xsheet.data.columns), ['Key', 'Status', 'Owner name'])
+        pages = list(xsheet.data_pages(SHEET, QUERY))
+        self.assertEqual(pages, [[{'Key': 'A-1', 'Status': 'New', 'Owner name': 'one'}]])
+
+    def test_default_columns(self):
+        """ All the columns are read for the default columns """
+        xsheet = Xsheet(self.args, None, None, 1)
+        sheet_config = Sheet(key='Key', default_columns=True, \
+                columns={'Key': Column(data='Key')})
+        xsheet.prepare({SHEET: sheet_config}, {SHEET: QUERY})
+        self.assertEqual(list(xsheet.data.columns), ['Key', 'Summary', 'Status', 'Owner name'])
@@ -0,0 +1,80 @@
+"""
+Testing the local target spreadsheet that reads only the active sheets
+and loads the complete workbook when it is updated.
+"""
+
+import unittest
+
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from synct.config import Column, Sheet
+from synct.ysheet import Ysheet
+from tests import temporary_directory
+
+SHEET = 'TEST'
+OTHER_SHEET = 'OTHER'
+
+class TestYsheet(unittest.TestCase):
+    """ Test reading and updating the local target spreadsheet """
+
+    def setUp(self):
+        """ Create the workbook in a temporary directory """
+        self.directory = temporary_directory(self)
+        self.file_name = str(Path(self.directory) / 'target.xlsx')
+        workbook = Workbook()
+        worksheet = workbook.active
+        worksheet.title = SHEET
+        for row in (['Key', 'Summary'], ['A-1', 'first'], ['A-2', '=B2'], ['A-3', 'third']):
+            worksheet.append(row)
+        worksheet['B2'].font = Font(bold=True)
+        other = workbook.create_sheet(OTHER_SHEET)
+        other.append(['untouched'])
+        workbook.save(self.file_name)
+        self.config = SimpleNamespace(spreadsheet=self.file_name, \
+                sheets={SHEET: Sheet(key='Key', columns={})})
+
+    def test_read_active_sheets(self):
+        """ Values of the active sheets are read without the complete workbook """
+        ysheet = Ysheet(self.config)
+        self.assertIsNone(ysheet.workbook)
+        self.assertEqual(ysheet.data[SHEET].columns.tolist(), ['Key', 'Summary'])
+        self.assertEqual(ysheet.data[SHEET].values.tolist(),
+                         [['A-1', 'first'], ['A-2', '=B2'], ['A-3', 'third']])
+
+    def test_update(self):
+        """ The updated workbook keeps the formatting and the other sheets """
+        ysheet = Ysheet(self.config)
+        ysheet.data[SHEET].iat[0, 1] = 'changed'
+        ysheet.update_data(False)
+        workbook = load_workbook(self.file_name)
+        self.assertEqual(workbook[SHEET]['B2'].value, 'changed')
+        self.assertTrue(workbook[SHEET]['B2'].font.bold)
+        self.assertEqual(workbook[SHEET]['B3'].value, '=B2')
+        self.assertEqual(workbook[OTHER_SHEET]['A1'].value, 'untouched')
+
+    def test_single_save(self):
+        """ Rows are removed with their links and saved at once """
+        self.config.sheets[SHEET].columns = {'Key': Column(data='key', link='https://x/')}
+        ysheet = Ysheet(self.config)
+        ysheet.remove_rows[SHEET] = [0, 2]
+        with patch.object(Ysheet, 'save', wraps=ysheet.save) as mock_save:
+            ysheet.update_data(True)
+        mock_save.assert_called_once()
+        worksheet = load_workbook(self.file_name)[SHEET]
+        self.assertEqual([row[0] for row in worksheet.values], ['Key', 'A-2'])
+        self.assertEqual(worksheet['A2'].hyperlink.target, 'https://x/A-2')
+        self.assertEqual(worksheet['A2'].hyperlink.ref, 'A2')
+        self.assertIsNone(worksheet['A3'].hyperlink)
+
+    def test_no_changes(self):
+        """ The file is not rewritten without any changes """
+        original = Path(self.file_name).read_bytes()
+        ysheet = Ysheet(self.config)
+        ysheet.update_data(True)
+        self.assertIsNone(ysheet.workbook)
+        self.assertEqual(Path(self.file_name).read_bytes(), original)